@@ -0,0 +1,132 @@
+import argparse
+import json
+import multiprocessing
+import sys
+
+import degrees
+from landmarks import LandmarkIndex
+
+# Search used to answer queries, set before any worker is started
+search = degrees.shortest_path
+
+
+def resolve(name):
+    """
+    Returns the IMDB id for a person's name, or raises ValueError
+    if there is no such person or the name is ambiguous.
+    """
+    person_ids = degrees.names.get(name.lower(), set())
+    if len(person_ids) == 0:
+        raise ValueError(f"person not found: {name}")
+    if len(person_ids) > 1:
+        raise ValueError(f"ambiguous name: {name}")
+    return next(iter(person_ids))
+
+
+def answer(pair):
+    """
+    Answers a single (source name, target name) query,
+    returning a JSON-serializable dictionary.
+
+    A malformed line from `read_pairs` is answered with an error.
+    """
+    if len(pair) != 2:
+        line = "\t".join(pair)
+        return {"error": f"expected two tab-separated names: {line!r}"}
+    source_name, target_name = pair
+    result = {"source": source_name, "target": target_name}
+    try:
+        source = resolve(source_name)
+        target = resolve(target_name)
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+
+    path = search(source, target)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [
+            {
+                "movie_id": movie_id,
+                "movie": degrees.movies[movie_id]["title"],
+                "person_id": person_id,
+                "person": degrees.people[person_id]["name"]
+            }
+            for movie_id, person_id in path
+        ]
+    return result
+
+
+def read_pairs(f):
+    """
+    Yields (source name, target name) pairs from a stream
+    holding one tab-separated pair per line.
+
+    A line without exactly two names is yielded as the tuple of its
+    fields, so that one bad line is reported rather than ending the batch.
+    """
+    for line in f:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        yield tuple(field.strip() for field in line.split("\t"))
+
+
+def answer_all(pairs, workers, chunksize=16):
+    """
+    Yields the answer to every pair, in order.
+
+    With more than one worker, queries are spread over a pool of forked
+    processes, which share the already-loaded data copy-on-write.
+    Workers beyond the number of cores only add overhead.
+    """
+    if workers <= 1:
+        yield from map(answer, pairs)
+        return
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        yield from pool.imap(answer, pairs, chunksize)
+
+
+def main():
+    global search
+
+    parser = argparse.ArgumentParser(
+        usage="python batch.py [--engine ENGINE] [--snapshot] [--landmarks PATH] [--workers N] directory [pairs]"
+    )
+    parser.add_argument("directory")
+    parser.add_argument("pairs", nargs="?", type=argparse.FileType("r", encoding="utf-8"),
+                        default=sys.stdin, help="file of tab-separated name pairs (default: stdin)")
+    parser.add_argument("--engine", choices=sorted(degrees.ENGINES), default="bidirectional")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="load from a binary snapshot of the directory")
+    parser.add_argument("--landmarks", metavar="PATH",
+                        help="landmark index to load, or to build and save if missing")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load(args.directory, args.snapshot)
+    print("Data loaded.", file=sys.stderr)
+
+    # Build any graph or index the engine needs once here rather than once per worker
+    if args.landmarks:
+        degrees.load_landmarks(args.landmarks)
+    if args.engine in ("compact", "landmarks"):
+        degrees.compact_graph()
+    if args.engine == "landmarks" and degrees.landmark_index is None:
+        degrees.landmark_index = LandmarkIndex.build(degrees.compact_graph())
+    search = degrees.ENGINES[args.engine]
+
+    # A client on stdin may send one pair and wait for its answer,
+    # so hand each pair to a worker as soon as it is read
+    chunksize = 1 if args.pairs is sys.stdin else 16
+    for result in answer_all(read_pairs(args.pairs), args.workers, chunksize):
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import argparse
+import random
+import time
+
+import batch
+import degrees
+from landmarks import LandmarkIndex
+from snapshot import read_snapshot, snapshot_path, write_snapshot
+from util import Node, StackFrontier, QueueFrontier
+
+
+def sample_pairs(count, seed):
+    """
+    Returns `count` random (source, target) pairs of person_ids,
+    drawn from people who have starred in at least one movie.
+    """
+    rng = random.Random(seed)
+    person_ids = sorted(
+        person_id for person_id in degrees.people
+        if degrees.people[person_id]["movies"]
+    )
+    return [tuple(rng.sample(person_ids, 2)) for _ in range(count)]
+
+
+def count_expansions():
+    """
+    Wraps `degrees.neighbors_for_person` so that every call is counted.
+    Returns a one-element list holding the running count.
+    """
+    neighbors_for_person = degrees.neighbors_for_person
+    counter = [0]
+
+    def counted(person_id):
+        counter[0] += 1
+        return neighbors_for_person(person_id)
+
+    degrees.neighbors_for_person = counted
+    return counter
+
+
+def reset_expansions(counter):
+    """
+    Zeroes the count of people expanded by any engine: the wrapped
+    `neighbors_for_person`, and the counters the compact graph and
+    landmark index keep, as their searches never call it.
+    """
+    counter[0] = 0
+    for searcher in (degrees.compact, degrees.landmark_index):
+        if searcher is not None:
+            searcher.expansions = 0
+
+
+def total_expansions(counter):
+    """Returns the people expanded by any engine since `reset_expansions`."""
+    total = counter[0]
+    for searcher in (degrees.compact, degrees.landmark_index):
+        if searcher is not None:
+            total += searcher.expansions
+    return total
+
+
+def benchmark_search(args):
+    """
+    Compares nodes expanded and wall time of each search engine
+    over the same randomly sampled pairs.
+    """
+    pairs = sample_pairs(args.pairs, args.seed)
+    counter = count_expansions()
+
+    lengths = {}
+    print(f"{'engine':<15} {'expanded':>12} {'seconds':>10}")
+    for name in args.engines:
+        search = degrees.ENGINES[name]
+        reset_expansions(counter)
+        start = time.perf_counter()
+        lengths[name] = [
+            None if path is None else len(path)
+            for path in (search(source, target) for source, target in pairs)
+        ]
+        elapsed = time.perf_counter() - start
+        print(f"{name:<15} {total_expansions(counter):>12} {elapsed:>10.3f}")
+
+    # Every engine must agree on the degrees of separation
+    reference = lengths[args.engines[0]]
+    for name in args.engines[1:]:
+        if lengths[name] != reference:
+            print(f"Warning: {name} disagrees with {args.engines[0]}")
+
+
+def benchmark_frontier(args):
+    """
+    Measures how many nodes per second each frontier can pop
+    once it has been filled to a given size.
+    """
+    print(f"{'frontier':<15} {'size':>10} {'pops/sec':>14} {'lookups/sec':>14}")
+    for size in args.sizes:
+        for frontier_class in (StackFrontier, QueueFrontier):
+            frontier = frontier_class()
+            for state in range(size):
+                frontier.add(Node(state, None, None))
+
+            start = time.perf_counter()
+            for state in range(0, size, max(1, size // 1000)):
+                frontier.contains_state(state)
+            lookups = min(size, 1000) / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            while not frontier.empty():
+                frontier.remove()
+            pops = size / (time.perf_counter() - start)
+            print(f"{frontier_class.__name__:<15} {size:>10} {pops:>14,.0f} {lookups:>14,.0f}")
+
+
+def benchmark_batch(args):
+    """
+    Measures batch query throughput for an increasing number of workers.
+    """
+    # Only people with unique names can be looked up without prompting
+    unique = sorted(
+        person_ids for person_ids in degrees.names.values() if len(person_ids) == 1
+    )
+    rng = random.Random(args.seed)
+    pairs = [
+        tuple(degrees.people[person_id]["name"]
+              for person_ids in rng.sample(unique, 2) for person_id in person_ids)
+        for _ in range(args.pairs)
+    ]
+    batch.search = degrees.ENGINES[args.engine]
+
+    print(f"{'workers':>8} {'queries/sec':>14}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        for _ in batch.answer_all(pairs, workers):
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>8} {len(pairs) / elapsed:>14,.1f}")
+
+
+def benchmark_landmarks(args):
+    """
+    Reports landmark index build time and size, how tight its bounds are,
+    and how landmark-guided search compares with plain search.
+    """
+    graph = degrees.compact_graph()
+
+    start = time.perf_counter()
+    index = LandmarkIndex.build(graph, args.k)
+    build_seconds = time.perf_counter() - start
+    print(f"Built {args.k} landmarks in {build_seconds:.3f} s, {index.nbytes():,} bytes")
+
+    pairs = sample_pairs(args.pairs, args.seed)
+    exact = 0
+    start = time.perf_counter()
+    for source, target in pairs:
+        lower, upper = index.bounds(graph.person_index[source], graph.person_index[target])
+        exact += lower == upper
+    bounds_seconds = time.perf_counter() - start
+    print(f"Bounds for {len(pairs)} pairs in {bounds_seconds:.6f} s, {exact} exact")
+
+    degrees.landmark_index = index
+    args.engines = ["bidirectional", "compact", "landmarks"]
+    benchmark_search(args)
+
+
+def clear_data():
+    """Empties the dictionaries filled in by loading."""
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.compact = None
+
+
+def benchmark_startup(args):
+    """
+    Compares the time to load the CSV files with the time to
+    map a binary snapshot of them, and then to build every
+    person and movie record the snapshot otherwise builds on lookup.
+    """
+    path = snapshot_path(args.directory)
+
+    start = time.perf_counter()
+    degrees.load_data(args.directory)
+    csv_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    write_snapshot(path, degrees.people, degrees.movies)
+    compile_seconds = time.perf_counter() - start
+    clear_data()
+
+    start = time.perf_counter()
+    degrees.compact, degrees.names, degrees.people, degrees.movies = read_snapshot(path)
+    snapshot_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    degrees.people.build_all()
+    degrees.movies.build_all()
+    records_seconds = time.perf_counter() - start
+
+    print(f"{'CSV load':<20} {csv_seconds:>10.3f} s")
+    print(f"{'snapshot compile':<20} {compile_seconds:>10.3f} s")
+    print(f"{'snapshot load':<20} {snapshot_seconds:>10.3f} s")
+    print(f"{'snapshot records':<20} {records_seconds:>10.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+
+    search = benchmarks.add_parser("search", help="compare search engines")
+    search.add_argument("directory", nargs="?", default="large")
+    search.add_argument("--pairs", type=int, default=50)
+    search.add_argument("--seed", type=int, default=0)
+    search.add_argument("--engines", nargs="+", choices=sorted(degrees.ENGINES),
+                        default=["bfs", "bidirectional"])
+    search.set_defaults(run=benchmark_search, load=True)
+
+    frontier = benchmarks.add_parser("frontier", help="measure frontier throughput")
+    frontier.add_argument("--sizes", nargs="+", type=int,
+                          default=[10 ** 5, 10 ** 6])
+    frontier.set_defaults(run=benchmark_frontier, load=False)
+
+    startup = benchmarks.add_parser("startup", help="compare CSV and snapshot loading")
+    startup.add_argument("directory", nargs="?", default="large")
+    startup.set_defaults(run=benchmark_startup, load=False)
+
+    throughput = benchmarks.add_parser("batch", help="measure batch query throughput")
+    throughput.add_argument("directory", nargs="?", default="large")
+    throughput.add_argument("--pairs", type=int, default=1000)
+    throughput.add_argument("--seed", type=int, default=0)
+    throughput.add_argument("--engine", choices=sorted(degrees.ENGINES), default="bidirectional")
+    throughput.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    throughput.set_defaults(run=benchmark_batch, load=True)
+
+    alt = benchmarks.add_parser("landmarks", help="measure the landmark index")
+    alt.add_argument("directory", nargs="?", default="large")
+    alt.add_argument("-k", type=int, default=16)
+    alt.add_argument("--pairs", type=int, default=50)
+    alt.add_argument("--seed", type=int, default=0)
+    alt.set_defaults(run=benchmark_landmarks, load=True)
+
+    args = parser.parse_args()
+    if args.load:
+        print("Loading data...")
+        degrees.load_data(args.directory)
+        print("Data loaded.")
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
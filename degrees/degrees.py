@@ -1,6 +1,13 @@
+import argparse
 import csv
+import io
+import os
 import sys
 
+from graph import CompactGraph
+from landmarks import LandmarkIndex
+from snapshot import is_stale, read_snapshot, snapshot_path, write_snapshot
+from trees import SourceTreeCache
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,6 +19,15 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Maps each CSV file name to the byte offset up to which it has been loaded
+loaded = {}
+
+# Integer-indexed copy of people and movies, built on first use by the compact engine
+compact = None
+
+# Distances from landmark people over `compact`, built on first use by the landmarks engine
+landmark_index = None
+
 
 def load_data(directory):
     """
@@ -21,45 +37,152 @@ def load_data(directory):
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+            add_person(row)
+        loaded["people.csv"] = f.tell()
 
     # Load movies
     with open(f"{directory}/movies.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+            add_movie(row)
+        loaded["movies.csv"] = f.tell()
 
     # Load stars
     with open(f"{directory}/stars.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+            add_star(row)
+        loaded["stars.csv"] = f.tell()
+
+
+def add_person(row):
+    """Adds a row of people.csv to `people` and `names`."""
+    people[row["id"]] = {
+        "name": row["name"],
+        "birth": row["birth"],
+        "movies": set()
+    }
+    if row["name"].lower() not in names:
+        names[row["name"].lower()] = {row["id"]}
+    else:
+        names[row["name"].lower()].add(row["id"])
+
+
+def add_movie(row):
+    """Adds a row of movies.csv to `movies`."""
+    movies[row["id"]] = {
+        "title": row["title"],
+        "year": row["year"],
+        "stars": set()
+    }
+
+
+def add_star(row):
+    """
+    Links the person and movie in a row of stars.csv.
+    Returns False if either of them is unknown.
+    """
+    try:
+        people[row["person_id"]]["movies"].add(row["movie_id"])
+        movies[row["movie_id"]]["stars"].add(row["person_id"])
+    except KeyError:
+        return False
+    return True
+
+
+def read_appended(path, offset):
+    """
+    Returns the complete rows appended to the CSV file at `path` after
+    byte `offset`, and the offset just past the last complete row.
+    """
+    with open(path, "rb") as f:
+        fieldnames = next(csv.reader([f.readline().decode("utf-8")]))
+        f.seek(offset)
+        data = f.read()
+
+    # Leave a partially written last line for the next ingest
+    data = data[:data.rfind(b"\n") + 1]
+    rows = list(csv.DictReader(io.StringIO(data.decode("utf-8")), fieldnames=fieldnames))
+    return rows, offset + len(data)
+
+
+def ingest(directory):
+    """
+    Applies rows appended to the CSV files since they were
+    loaded (or last ingested) to the data already in memory.
+
+    Cached search trees that reach anyone who gained a co-star are dropped,
+    as are the compact graph and landmark index, which are rebuilt on next use.
+    Returns the number of people, movies and stars ingested.
+    """
+    global compact, landmark_index
+    counts = {}
+
+    rows, loaded["people.csv"] = read_appended(f"{directory}/people.csv", loaded["people.csv"])
+    for row in rows:
+        add_person(row)
+    counts["people"] = len(rows)
+
+    rows, loaded["movies.csv"] = read_appended(f"{directory}/movies.csv", loaded["movies.csv"])
+    for row in rows:
+        add_movie(row)
+    counts["movies"] = len(rows)
+
+    rows, loaded["stars.csv"] = read_appended(f"{directory}/stars.csv", loaded["stars.csv"])
+    touched = set()
+    counts["stars"] = 0
+    for row in rows:
+        if add_star(row):
+            counts["stars"] += 1
+            touched.update(movies[row["movie_id"]]["stars"])
+
+    # The landmark index is built over the compact graph, so goes with it
+    if counts["people"] or counts["movies"] or touched:
+        compact = None
+        landmark_index = None
+    if touched:
+        source_trees.invalidate(touched)
+    return counts
+
+
+def load(directory, snapshot=False):
+    """
+    Load data into memory, either by parsing the CSV files or,
+    if `snapshot` is set, by mapping a binary snapshot of them.
+
+    The snapshot is (re)built from the CSV files whenever it is
+    missing or older than any of them.
+    """
+    global compact, names, people, movies
+    if not snapshot:
+        load_data(directory)
+    elif is_stale(directory):
+        load_data(directory)
+        write_snapshot(snapshot_path(directory), people, movies)
+    else:
+        compact, names, people, movies = read_snapshot(snapshot_path(directory))
+
+        # A fresh snapshot holds every row the CSV files currently have
+        for filename in ("people.csv", "movies.csv", "stars.csv"):
+            loaded[filename] = os.path.getsize(f"{directory}/{filename}")
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(usage="python degrees.py [--engine ENGINE] [--snapshot] [--landmarks PATH] [directory]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="bfs")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="load from a binary snapshot of the directory")
+    parser.add_argument("--landmarks", metavar="PATH",
+                        help="landmark index to load, or to build and save if missing")
+    args = parser.parse_args()
+    search = ENGINES[args.engine]
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load(args.directory, args.snapshot)
+    if args.landmarks:
+        load_landmarks(args.landmarks)
     print("Data loaded.")
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -68,7 +191,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = search(source, target)
 
     if path is None:
         print("Not connected.")
@@ -96,8 +219,8 @@ def shortest_path(source, target):
     frontier = QueueFrontier()
     frontier.add(start)
 
-    # Keeps track of explored Nodes
-    explored = []
+    # Keeps track of explored states
+    explored = set()
 
     while True:
 
@@ -109,12 +232,12 @@ def shortest_path(source, target):
         node = frontier.remove()
 
         # If goal not yet found, mark node as explored
-        explored.append(node.state)
+        explored.add(node.state)
 
         # Add neighbours to frontier
         for action, state in neighbors_for_person(node.state):
             # If state not currently in frontier and the state has not been explored yet
-            if state not in explored:
+            if state not in explored and not frontier.contains_state(state):
                 child = Node(state, node, action)
                 frontier.add(child)
 
@@ -132,6 +255,136 @@ def shortest_path(source, target):
 
                 return solution
 
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching outwards
+    from both ends at once until the two frontiers meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached person to the (movie_id, person_id) step that led to them.
+    # Forward steps point back towards the source, backward steps towards the target
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    while forward_layer and backward_layer:
+
+        # Always grow the smaller frontier, since it is the cheaper one to expand
+        if len(forward_layer) <= len(backward_layer):
+            forward_layer, meeting = expand_layer(forward_layer, forward, backward)
+        else:
+            backward_layer, meeting = expand_layer(backward_layer, backward, forward)
+
+        if meeting is not None:
+            return join_paths(forward, backward, meeting)
+
+    # One side ran out of people to explore without meeting the other
+    return None
+
+
+def expand_layer(layer, reached, opposite):
+    """
+    Expands every person in `layer` by one step, recording new people in `reached`.
+
+    Returns the next layer, and the person at which this search met the
+    `opposite` one (or None if the frontiers have not met yet).
+    """
+    next_layer = []
+    meeting = None
+    for person_id in layer:
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            if neighbor_id in reached:
+                continue
+            reached[neighbor_id] = (movie_id, person_id)
+            next_layer.append(neighbor_id)
+
+            # Every meeting found within a single layer gives a path of the same length
+            if meeting is None and neighbor_id in opposite:
+                meeting = neighbor_id
+        if meeting is not None:
+            break
+    return next_layer, meeting
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Builds the (movie_id, person_id) path through `meeting` from
+    the parents recorded by the forward and backward searches.
+    """
+    solution = []
+
+    # Walk back from the meeting person to the source
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent_id = forward[person_id]
+        solution.append((movie_id, person_id))
+        person_id = parent_id
+    solution.reverse()
+
+    # Walk on from the meeting person to the target
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, child_id = backward[person_id]
+        solution.append((movie_id, child_id))
+        person_id = child_id
+
+    return solution
+
+
+def compact_graph():
+    """Returns the compact copy of the loaded data, building it if needed."""
+    global compact
+    if compact is None:
+        compact = CompactGraph.from_dicts(people, movies)
+    return compact
+
+
+def compact_shortest_path(source, target):
+    """
+    Returns the same path as `shortest_path`, searching over a
+    compact integer-indexed copy of the graph instead of the dicts.
+    """
+    return compact_graph().shortest_path(source, target)
+
+
+def load_landmarks(path, k=16):
+    """
+    Loads the landmark index at `path`, building and saving it first
+    if it does not exist or was built for a different graph.
+    """
+    global landmark_index
+    try:
+        landmark_index = LandmarkIndex.load(path, compact_graph())
+    except (FileNotFoundError, ValueError):
+        landmark_index = LandmarkIndex.build(compact_graph(), k)
+        landmark_index.save(path, compact_graph())
+
+
+def landmark_shortest_path(source, target):
+    """
+    Returns the same path as `shortest_path`, using an A* search
+    guided by distances from landmark people.
+    """
+    global landmark_index
+    if landmark_index is None:
+        landmark_index = LandmarkIndex.build(compact_graph())
+    return landmark_index.shortest_path(compact_graph(), source, target)
+
+
+def cached_shortest_path(source, target):
+    """
+    Returns the same path as `shortest_path`, walking a cached
+    search tree rooted at the source instead of searching again.
+    """
+    return source_trees.shortest_path(source, target)
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -171,5 +424,19 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+# Search trees of recently used sources, shared by every cached query.
+# Neighbors are looked up at call time, so a replaced `neighbors_for_person` is used
+source_trees = SourceTreeCache(lambda person_id: neighbors_for_person(person_id))
+
+# Search engines selectable from the command line
+ENGINES = {
+    "bfs": shortest_path,
+    "bidirectional": bidirectional_shortest_path,
+    "cached": cached_shortest_path,
+    "compact": compact_shortest_path,
+    "landmarks": landmark_shortest_path,
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,166 @@
+import sys
+import zlib
+from array import array
+
+
+def little_endian(values):
+    """Returns a copy of `values` as 4-byte ints in little-endian byte order."""
+    values = array("i", values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def read_ints(buffer):
+    """
+    Returns the 4-byte little-endian ints held in `buffer`, as a view onto
+    it on little-endian machines and as a byte-swapped copy elsewhere.
+    """
+    if sys.byteorder == "little":
+        return buffer.cast("i")
+    values = array("i")
+    values.frombytes(buffer)
+    values.byteswap()
+    return values
+
+
+class CompactGraph():
+    """
+    Bipartite person/movie graph with IMDB ids interned to dense integers.
+
+    Adjacency is stored in compressed sparse row (CSR) form: the movies of
+    person `i` are `person_movies[person_offsets[i]:person_offsets[i + 1]]`,
+    and the stars of movie `m` are `movie_stars[movie_offsets[m]:movie_offsets[m + 1]]`.
+    """
+
+    def __init__(self, person_ids, movie_ids,
+                 person_offsets, person_movies, movie_offsets, movie_stars):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        # People whose movies `shortest_path` has walked, over all searches
+        self.expansions = 0
+
+    @classmethod
+    def from_dicts(cls, people, movies):
+        """
+        Builds a compact graph from the `people` and `movies`
+        dictionaries filled in by `load_data`.
+        """
+        person_ids = list(people)
+        movie_ids = list(movies)
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        person_offsets = array("i", [0])
+        person_movies = array("i")
+        for person_id in person_ids:
+            person_movies.extend(sorted(movie_index[movie_id]
+                                        for movie_id in people[person_id]["movies"]))
+            person_offsets.append(len(person_movies))
+
+        movie_offsets = array("i", [0])
+        movie_stars = array("i")
+        for movie_id in movie_ids:
+            movie_stars.extend(sorted(person_index[person_id]
+                                      for person_id in movies[movie_id]["stars"]))
+            movie_offsets.append(len(movie_stars))
+
+        return cls(person_ids, movie_ids,
+                   person_offsets, person_movies, movie_offsets, movie_stars)
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def movies_of(self, person):
+        """Returns the movie indexes a person index starred in."""
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """Returns the person indexes who starred in a movie index."""
+        return self.movie_stars[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people who
+        starred with a given person index.
+        """
+        for movie in self.movies_of(person):
+            for star in self.stars_of(movie):
+                yield movie, star
+
+    def checksum(self):
+        """Returns a CRC-32 of the adjacency arrays, the same on any machine."""
+        checksum = 0
+        for values in (self.person_offsets, self.person_movies,
+                       self.movie_offsets, self.movie_stars):
+            if sys.byteorder == "big":
+                values = little_endian(values)
+            checksum = zlib.crc32(values, checksum)
+        return checksum
+
+    def degree(self, person):
+        """Returns the number of movies a person index starred in."""
+        return self.person_offsets[person + 1] - self.person_offsets[person]
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        If no possible path, returns None.
+        """
+        source = self.person_index[source]
+        target = self.person_index[target]
+        if source == target:
+            return []
+
+        # Person and movie each reached person was first reached through
+        parent_person = array("i", [-1]) * len(self.person_ids)
+        parent_movie = array("i", [-1]) * len(self.person_ids)
+        reached = bytearray(len(self.person_ids))
+        reached[source] = 1
+
+        # Every star of a movie is reached the first time the movie is
+        # walked, so no movie ever needs to be walked twice
+        walked = bytearray(len(self.movie_ids))
+
+        queue = [source]
+        head = 0
+        while head < len(queue):
+            person = queue[head]
+            head += 1
+            self.expansions += 1
+            for movie in self.movies_of(person):
+                if walked[movie]:
+                    continue
+                walked[movie] = 1
+                for star in self.stars_of(movie):
+                    if reached[star]:
+                        continue
+                    reached[star] = 1
+                    parent_person[star] = person
+                    parent_movie[star] = movie
+                    if star == target:
+                        return self.path_to(target, parent_person, parent_movie)
+                    queue.append(star)
+
+        return None
+
+    def path_to(self, person, parent_person, parent_movie):
+        """
+        Follows parent links back from `person` and returns the
+        (movie_id, person_id) pairs leading to it.
+        """
+        solution = []
+        while parent_person[person] != -1:
+            solution.append((self.movie_ids[parent_movie[person]], self.person_ids[person]))
+            person = parent_person[person]
+        solution.reverse()
+        return solution
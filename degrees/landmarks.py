@@ -0,0 +1,204 @@
+import heapq
+import math
+import struct
+from array import array
+
+from graph import little_endian, read_ints
+
+MAGIC = b"DEGLMK02"
+
+# Magic, then the number of people in the graph, the number of landmarks,
+# the graph's person->movie and movie->star edge counts and its checksum
+HEADER = struct.Struct("<8s4QI")
+
+# Distance stored for people a landmark cannot reach; real
+# distances are capped one below so they always fit in a byte
+UNREACHABLE = 255
+
+
+def distances_from(graph, source):
+    """
+    Returns a bytearray holding the degrees of separation of every
+    person index in `graph` from the `source` person index.
+    """
+    distances = bytearray([UNREACHABLE]) * len(graph)
+    distances[source] = 0
+    walked = bytearray(len(graph.movie_ids))
+    layer = [source]
+    depth = 0
+    while layer:
+        depth = min(depth + 1, UNREACHABLE - 1)
+        next_layer = []
+        for person in layer:
+            for movie in graph.movies_of(person):
+                if walked[movie]:
+                    continue
+                walked[movie] = 1
+                for star in graph.stars_of(movie):
+                    if distances[star] == UNREACHABLE:
+                        distances[star] = depth
+                        next_layer.append(star)
+        layer = next_layer
+    return distances
+
+
+class LandmarkIndex():
+    """
+    Precomputed degrees of separation from a handful of landmark people,
+    giving bounds on the separation of any two people in the same graph.
+    """
+
+    def __init__(self, landmarks, landmark_ids, distances):
+        # Person indexes and IMDB ids of the landmarks
+        self.landmarks = landmarks
+        self.landmark_ids = landmark_ids
+
+        # One byte per person for each landmark
+        self.distances = distances
+
+        # People whose neighbors `shortest_path` has generated, over all searches
+        self.expansions = 0
+
+    @classmethod
+    def build(cls, graph, k=16):
+        """
+        Builds an index for `graph` from its `k` people who
+        starred in the most movies.
+        """
+        landmarks = sorted(range(len(graph)), key=graph.degree, reverse=True)[:k]
+        return cls(
+            landmarks,
+            [graph.person_ids[landmark] for landmark in landmarks],
+            [distances_from(graph, landmark) for landmark in landmarks]
+        )
+
+    def save(self, path, graph):
+        """Writes the index, built for `graph`, to `path`."""
+        ids = "\0".join(self.landmark_ids).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(graph), len(self.landmarks),
+                                len(graph.person_movies), len(graph.movie_stars),
+                                graph.checksum()))
+            little_endian(self.landmarks).tofile(f)
+            f.write(struct.pack("<Q", len(ids)))
+            f.write(ids)
+            for distances in self.distances:
+                f.write(distances)
+
+    @classmethod
+    def load(cls, path, graph):
+        """
+        Reads an index written by `save`, checking that
+        it was built for the same `graph`.
+        """
+        with open(path, "rb") as f:
+            data = memoryview(f.read())
+        magic, people, k, person_edges, movie_edges, checksum = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a landmark index")
+
+        offset = HEADER.size
+        landmarks = read_ints(data[offset:offset + 4 * k])
+        offset += 4 * k
+        (ids_length,) = struct.unpack_from("<Q", data, offset)
+        offset += 8
+        landmark_ids = str(data[offset:offset + ids_length], "utf-8").split("\0") if k else []
+        offset += ids_length
+
+        # Rows appended to stars.csv keep the people but change the edges,
+        # and stale distances would make the search heuristic overestimate
+        if (people != len(graph)
+                or person_edges != len(graph.person_movies)
+                or movie_edges != len(graph.movie_stars)
+                or checksum != graph.checksum()
+                or any(graph.person_ids[landmark] != landmark_id
+                       for landmark, landmark_id in zip(landmarks, landmark_ids))):
+            raise ValueError(f"{path} was built for a different graph")
+
+        distances = [data[offset + i * people:offset + (i + 1) * people] for i in range(k)]
+        return cls(list(landmarks), landmark_ids, distances)
+
+    def nbytes(self):
+        """Returns the size of the stored distances in bytes."""
+        return sum(len(distances) for distances in self.distances)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation
+        between two person indexes.
+
+        A lower bound of infinity means the two are not connected,
+        and an upper bound of infinity means no landmark reaches both.
+        """
+        lower = 0
+        upper = math.inf
+        for distances in self.distances:
+            to_source = distances[source]
+            to_target = distances[target]
+            if to_source == UNREACHABLE and to_target == UNREACHABLE:
+                continue
+            if to_source == UNREACHABLE or to_target == UNREACHABLE:
+                return math.inf, math.inf
+            lower = max(lower, abs(to_source - to_target))
+            upper = min(upper, to_source + to_target)
+        return lower, upper
+
+    def shortest_path(self, graph, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, using A* search
+        with landmark lower bounds as the heuristic (ALT).
+
+        If no possible path, returns None.
+        """
+        source = graph.person_index[source]
+        target = graph.person_index[target]
+        if source == target:
+            return []
+        if self.bounds(source, target)[0] == math.inf:
+            return None
+
+        # Landmark distances to the target, fixed for the whole search
+        targets = [(distances, distances[target]) for distances in self.distances]
+
+        def heuristic(person):
+            estimate = 0
+            for distances, to_target in targets:
+                to_person = distances[person]
+                if to_person == UNREACHABLE or to_target == UNREACHABLE:
+                    if to_person != to_target:
+                        return math.inf
+                    continue
+                estimate = max(estimate, abs(to_person - to_target))
+            return estimate
+
+        parent_person = array("i", [-1]) * len(graph)
+        parent_movie = array("i", [-1]) * len(graph)
+        cost = {source: 0}
+        expanded = bytearray(len(graph))
+
+        # Ties on estimated length go to the person furthest from the source
+        frontier = [(heuristic(source), 0, source)]
+
+        while frontier:
+            _, steps, person = heapq.heappop(frontier)
+            steps = -steps
+            if expanded[person]:
+                continue
+            if person == target:
+                return graph.path_to(target, parent_person, parent_movie)
+            expanded[person] = 1
+            self.expansions += 1
+
+            for movie, star in graph.neighbors(person):
+                if expanded[star] or cost.get(star, math.inf) <= steps + 1:
+                    continue
+                estimate = heuristic(star)
+                if estimate == math.inf:
+                    continue
+                cost[star] = steps + 1
+                parent_person[star] = person
+                parent_movie[star] = movie
+                heapq.heappush(frontier, (steps + 1 + estimate, -(steps + 1), star))
+
+        return None
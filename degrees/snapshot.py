@@ -0,0 +1,217 @@
+import mmap
+import os
+import struct
+import sys
+
+from graph import CompactGraph, little_endian, read_ints
+
+MAGIC = b"DEGSNAP1"
+
+# Magic, then counts of people, movies, person->movie edges,
+# movie->star edges and the length of the string table in bytes
+HEADER = struct.Struct("<8s5Q")
+
+# Separates the fields of the string table
+SEPARATOR = "\0"
+
+CSV_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+
+def snapshot_path(directory):
+    """Returns where the snapshot of a data directory is kept."""
+    return os.path.join(directory, "degrees.snapshot")
+
+
+def is_stale(directory):
+    """
+    Returns True if the snapshot of `directory` is missing
+    or older than any of the CSV files it was built from.
+    """
+    path = snapshot_path(directory)
+    if not os.path.exists(path):
+        return True
+    built = os.path.getmtime(path)
+    return any(
+        os.path.getmtime(os.path.join(directory, filename)) > built
+        for filename in CSV_FILES
+    )
+
+
+def write_snapshot(path, people, movies):
+    """
+    Writes the `people` and `movies` dictionaries filled in by `load_data`
+    to a binary snapshot at `path`.
+
+    The snapshot holds the CSR arrays of a `CompactGraph` followed by
+    a table of ids, names, births, titles and years.
+    """
+    graph = CompactGraph.from_dicts(people, movies)
+    strings = SEPARATOR.join(
+        list(graph.person_ids)
+        + [people[person_id]["name"] for person_id in graph.person_ids]
+        + [people[person_id]["birth"] for person_id in graph.person_ids]
+        + list(graph.movie_ids)
+        + [movies[movie_id]["title"] for movie_id in graph.movie_ids]
+        + [movies[movie_id]["year"] for movie_id in graph.movie_ids]
+    ).encode("utf-8")
+
+    # Write next to the destination, then swap it in, so that
+    # readers never see a half-written snapshot
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(graph.person_ids), len(graph.movie_ids),
+                            len(graph.person_movies), len(graph.movie_stars),
+                            len(strings)))
+        for values in (graph.person_offsets, graph.person_movies,
+                       graph.movie_offsets, graph.movie_stars):
+            little_endian(values).tofile(f)
+        f.write(strings)
+    os.replace(temporary, path)
+
+
+class SnapshotRecords(dict):
+    """
+    Maps the ids of a snapshot table to their records, building each
+    record from the mapped file the first time it is looked up.
+
+    Walking the whole table builds every record not looked up yet.
+    """
+
+    def __init__(self, index, build):
+        super().__init__()
+
+        # Rows of the ids whose records may not have been built yet
+        self.pending = index
+        self.build = build
+
+    def __missing__(self, key):
+        if self.pending is None or key not in self.pending:
+            raise KeyError(key)
+        record = self.build(self.pending[key])
+        dict.__setitem__(self, key, record)
+        return record
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or (
+            self.pending is not None and key in self.pending
+        )
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def build_all(self):
+        """Builds every record not looked up yet, keeping snapshot order."""
+        if self.pending is None:
+            return
+        records = {
+            key: dict.pop(self, key) if dict.__contains__(self, key) else self.build(row)
+            for key, row in self.pending.items()
+        }
+
+        # Anything left was added after loading, so comes last
+        records.update(dict.items(self))
+        dict.clear(self)
+        dict.update(self, records)
+        self.pending = None
+
+    def __iter__(self):
+        self.build_all()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self.build_all()
+        return dict.__len__(self)
+
+    def keys(self):
+        self.build_all()
+        return dict.keys(self)
+
+    def values(self):
+        self.build_all()
+        return dict.values(self)
+
+    def items(self):
+        self.build_all()
+        return dict.items(self)
+
+
+def read_snapshot(path):
+    """
+    Maps the snapshot at `path` into memory.
+
+    Returns a `CompactGraph` whose arrays are views onto the mapped file,
+    followed by `names`, `people` and `movies` dictionaries like those
+    filled in by `load_data`. Only `names` is filled in up front: the
+    records of `people` and `movies` are built as they are looked up.
+    """
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, person_count, movie_count, person_edges, movie_edges, strings_length = (
+        HEADER.unpack_from(data)
+    )
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a degrees snapshot")
+
+    # Slice the int arrays straight out of the mapping, without copying
+    # them unless the machine's byte order differs from the file's
+    view = memoryview(data)
+    offset = HEADER.size
+    arrays = []
+    for length in (person_count + 1, person_edges, movie_count + 1, movie_edges):
+        end = offset + length * 4
+        arrays.append(read_ints(view[offset:end]))
+        offset = end
+    person_offsets, person_movies, movie_offsets, movie_stars = arrays
+
+    strings = str(data[offset:offset + strings_length], "utf-8").split(SEPARATOR)
+    person_ids = strings[:person_count]
+    person_names = strings[person_count:2 * person_count]
+    births = strings[2 * person_count:3 * person_count]
+    strings = strings[3 * person_count:]
+    movie_ids = strings[:movie_count]
+    titles = strings[movie_count:2 * movie_count]
+    years = strings[2 * movie_count:]
+
+    graph = CompactGraph(person_ids, movie_ids,
+                         person_offsets, person_movies, movie_offsets, movie_stars)
+
+    def person(i):
+        return {
+            "name": person_names[i],
+            "birth": births[i],
+            "movies": {movie_ids[movie] for movie in graph.movies_of(i)}
+        }
+
+    def movie(i):
+        return {
+            "title": titles[i],
+            "year": years[i],
+            "stars": {person_ids[star] for star in graph.stars_of(i)}
+        }
+
+    names = {}
+    for person_id, name in zip(person_ids, person_names):
+        names.setdefault(name.lower(), set()).add(person_id)
+
+    people = SnapshotRecords(graph.person_index, person)
+    movies = SnapshotRecords(graph.movie_index, movie)
+    return graph, names, people, movies
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python snapshot.py directory")
+    directory = sys.argv[1]
+
+    import degrees
+    degrees.load_data(directory)
+    write_snapshot(snapshot_path(directory), degrees.people, degrees.movies)
+    print(f"Wrote {snapshot_path(directory)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+
+
+class SourceTree():
+    """
+    Breadth-first search tree rooted at a single source person,
+    recording how every reachable person was first reached.
+    """
+
+    def __init__(self, source, neighbors):
+        self.source = source
+
+        # Maps each reached person to the (movie_id, person_id) step that led to them
+        self.parents = {source: None}
+
+        # Number of people at each degree of separation from the source
+        self.layers = [1]
+
+        layer = [source]
+        while layer:
+            next_layer = []
+            for person_id in layer:
+                for movie_id, neighbor_id in neighbors(person_id):
+                    if neighbor_id not in self.parents:
+                        self.parents[neighbor_id] = (movie_id, person_id)
+                        next_layer.append(neighbor_id)
+            if next_layer:
+                self.layers.append(len(next_layer))
+            layer = next_layer
+
+    def __len__(self):
+        return len(self.parents)
+
+    def __contains__(self, person_id):
+        return person_id in self.parents
+
+    def path_to(self, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        If no possible path, returns None.
+        """
+        if target not in self.parents:
+            return None
+        solution = []
+        person_id = target
+        while self.parents[person_id] is not None:
+            movie_id, parent_id = self.parents[person_id]
+            solution.append((movie_id, person_id))
+            person_id = parent_id
+        solution.reverse()
+        return solution
+
+    def histogram(self):
+        """
+        Returns a dictionary mapping each degree of separation
+        to the number of people that far from the source.
+        """
+        return dict(enumerate(self.layers))
+
+
+class SourceTreeCache():
+    """
+    Least-recently-used cache of `SourceTree`s keyed by source person.
+
+    Memory is bounded by `max_entries`, the total number of reached people
+    held across all cached trees. Least recently used trees are evicted
+    until the total fits, although the most recent tree is always kept.
+    """
+
+    def __init__(self, neighbors, max_entries=10 ** 7):
+        self.neighbors = neighbors
+        self.max_entries = max_entries
+        self.trees = OrderedDict()
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+
+    def tree(self, source):
+        """Returns the search tree rooted at `source`, building it if needed."""
+        if source in self.trees:
+            self.hits += 1
+            self.trees.move_to_end(source)
+            return self.trees[source]
+
+        self.misses += 1
+        tree = SourceTree(source, self.neighbors)
+        self.trees[source] = tree
+        self.entries += len(tree)
+        while self.entries > self.max_entries and len(self.trees) > 1:
+            _, evicted = self.trees.popitem(last=False)
+            self.entries -= len(evicted)
+        return tree
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, walking the cached
+        search tree of the source.
+        """
+        return self.tree(source).path_to(target)
+
+    def histogram(self, source):
+        """
+        Returns a dictionary mapping each degree of separation
+        to the number of people that far from `source`.
+        """
+        return self.tree(source).histogram()
+
+    def invalidate(self, person_ids):
+        """
+        Drops every cached tree that reaches any of `person_ids`,
+        since new links to those people may shorten its paths.
+        """
+        person_ids = set(person_ids)
+        for source in list(self.trees):
+            tree = self.trees[source]
+            if any(person_id in tree for person_id in person_ids):
+                del self.trees[source]
+                self.entries -= len(tree)
+
+    def clear(self):
+        """Drops every cached tree, keeping the hit and miss counters."""
+        self.trees.clear()
+        self.entries = 0
+
+    def info(self):
+        """Returns a dictionary describing the cache's size and hit rate."""
+        return {
+            "trees": len(self.trees),
+            "entries": self.entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
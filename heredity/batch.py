@@ -0,0 +1,144 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from elimination import FamilyModel, family_shape
+from heredity import load_data
+
+# Compiled models by family shape, kept separately by every worker process
+models = {}
+
+# Whether to reuse compiled models, set before any worker is started
+reuse_models = True
+
+
+def family_files(source):
+    """
+    Returns the family CSV files to score: every .csv file in `source` if
+    it is a directory, otherwise the files listed one per line in `source`,
+    relative to its own directory. Blank lines and lines starting with #
+    are skipped.
+    """
+    if os.path.isdir(source):
+        return [os.path.join(source, filename) for filename in sorted(os.listdir(source))
+                if filename.endswith(".csv")]
+
+    base = os.path.dirname(source)
+    with open(source, encoding="utf-8") as f:
+        return [os.path.join(base, line.strip()) for line in f
+                if line.strip() and not line.lstrip().startswith("#")]
+
+
+def score(path):
+    """
+    Scores the family in the CSV file at `path`, returning a dictionary
+    with its people's gene and trait distributions, and whether a model
+    compiled for an earlier family of the same shape was reused.
+    """
+    result = {"family": path}
+    try:
+        people = load_data(path)
+        shape = family_shape(people)
+    except (OSError, KeyError, ValueError) as e:
+        result["error"] = str(e)
+        return result
+
+    model = models.get(shape) if reuse_models else None
+    result["reused"] = model is not None
+    if model is None:
+        model = FamilyModel(people)
+        if reuse_models:
+            models[shape] = model
+    result["probabilities"] = model.infer(people)
+    return result
+
+
+def score_all(paths, workers, chunksize=16):
+    """
+    Yields the result of scoring every family, in order.
+
+    With more than one worker, families are spread over a pool of
+    processes, each of which keeps its own cache of compiled models.
+    """
+    if workers <= 1:
+        yield from map(score, paths)
+        return
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        yield from pool.imap(score, paths, chunksize)
+
+
+def write_jsonl(results, f):
+    """
+    Writes each result as one line of JSON, yielding results as written.
+    """
+    for result in results:
+        f.write(json.dumps(result) + "\n")
+        yield result
+
+
+def write_csv(results, f):
+    """
+    Writes one CSV row per person of each result, yielding results as
+    written. Families that could not be scored are reported on stderr.
+    """
+    writer = csv.writer(f)
+    writer.writerow(["family", "name", "gene_2", "gene_1", "gene_0", "trait_true", "trait_false"])
+    for result in results:
+        if "error" in result:
+            print(f"{result['family']}: {result['error']}", file=sys.stderr)
+        else:
+            for person, distributions in result["probabilities"].items():
+                genes = distributions["gene"]
+                traits = distributions["trait"]
+                writer.writerow([result["family"], person, genes[2], genes[1], genes[0],
+                                 traits[True], traits[False]])
+        yield result
+
+
+def main():
+    global reuse_models
+
+    parser = argparse.ArgumentParser(
+        usage="python batch.py [--output PATH] [--format {jsonl,csv}] [--workers N] source"
+    )
+    parser.add_argument("source", help="directory of family CSVs, or a manifest listing them")
+    parser.add_argument("--output", help="file to write results to (default: stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        help="output format (default: from the output's extension, else jsonl)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--no-reuse", action="store_true",
+                        help="compile a fresh model for every family")
+    args = parser.parse_args()
+    reuse_models = not args.no_reuse
+
+    output_format = args.format
+    if output_format is None:
+        output_format = "csv" if args.output and args.output.endswith(".csv") else "jsonl"
+    write = write_csv if output_format == "csv" else write_jsonl
+
+    paths = family_files(args.source)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    scored = reused = failed = 0
+    try:
+        for result in write(score_all(paths, args.workers), out):
+            scored += 1
+            reused += result.get("reused", False)
+            failed += "error" in result
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Scored {scored} families in {elapsed:.2f}s "
+          f"({scored / elapsed if elapsed else 0:.1f} families/sec), "
+          f"{reused} with a reused model, {failed} failed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
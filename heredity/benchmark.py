@@ -0,0 +1,254 @@
+import argparse
+import csv
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy
+
+import batch
+import elimination
+import heredity
+import sampling
+import vectorized
+
+
+def synthetic_family(size, unknown=2, seed=0):
+    """
+    Return a family of `size` people in the form `load_data` returns:
+    a founding couple and their descendants, who mostly have children
+    with people from outside the family. All but `unknown` people,
+    chosen at random, have a known trait.
+    """
+    rng = random.Random(seed)
+    people = {}
+
+    def add(mother=None, father=None):
+        name = f"Person{len(people)}"
+        people[name] = {"name": name, "mother": mother, "father": father,
+                        "trait": rng.random() < 0.2}
+        return name
+
+    couples = [(add(), add())]
+    while len(people) < size:
+        mother, father = couples.pop(0) if couples else (add(), add())
+        for _ in range(rng.randint(1, 3)):
+            if len(people) >= size:
+                break
+            child = add(mother, father)
+            if len(people) < size:
+                couples.append((child, add()))
+
+    for person in rng.sample(list(people), min(unknown, size)):
+        people[person]["trait"] = None
+    return people
+
+
+def write_family(path, people):
+    """Writes `people` to a CSV file in the format `load_data` reads."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "mother", "father", "trait"])
+        for person in people.values():
+            trait = "" if person["trait"] is None else int(person["trait"])
+            writer.writerow([person["name"], person["mother"] or "", person["father"] or "", trait])
+
+
+def largest_difference(probabilities, other):
+    """Return the largest difference between two sets of distributions."""
+    return max(
+        abs(probabilities[person][field][value] - other[person][field][value])
+        for person in probabilities
+        for field in probabilities[person]
+        for value in probabilities[person][field]
+    )
+
+
+def benchmark_enumeration(args):
+    """
+    Compares the enumeration in heredity.py with the vectorized
+    enumerator and with the junction tree engine, taking the fastest
+    of `--repeat` runs of each.
+    """
+    engines = {
+        "enumeration": heredity.enumerate_probabilities,
+        "vectorized": vectorized.infer,
+        "junction tree": elimination.infer,
+    }
+    print(f"{'people':>6} {'engine':<14} {'seconds':>10} {'speedup':>8} {'max difference':>15}")
+    for size in args.sizes:
+        people = synthetic_family(size, args.unknown, args.seed)
+        baseline = None
+        for name, infer in engines.items():
+            elapsed = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                probabilities = infer(people)
+                elapsed = min(elapsed, time.perf_counter() - start)
+            if baseline is None:
+                baseline = (probabilities, elapsed)
+            print(f"{size:>6} {name:<14} {elapsed:>10.4f} {baseline[1] / elapsed:>7.1f}x "
+                  f"{largest_difference(baseline[0], probabilities):>15.3e}")
+
+
+def benchmark_pruning(args):
+    """
+    Compares the enumeration in heredity.py before and after pruning,
+    counting calls to `log_joint_probability`, the per-person factors those
+    calls multiply together, and the peak memory allocated, and taking
+    the fastest of `--repeat` runs of each.
+    """
+    log_joint_probability = heredity.log_joint_probability
+    calls = 0
+    factors = 0
+
+    def counted(people, *arguments):
+        nonlocal calls, factors
+        calls += 1
+        factors += len(people)
+        return log_joint_probability(people, *arguments)
+
+    engines = {
+        "enumeration": heredity.enumerate_probabilities,
+        "pruned": heredity.pruned_probabilities,
+    }
+    print(f"{'family':<18} {'engine':<12} {'calls':>8} {'factors':>8} {'peak KiB':>9} {'seconds':>8}")
+    heredity.log_joint_probability = counted
+    try:
+        for filename in args.families:
+            people = heredity.load_data(filename)
+            for name, infer in engines.items():
+                calls = factors = 0
+                tracemalloc.start()
+                infer(people)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                counts = (calls, factors)
+
+                # Tracing slows allocation down, so time separate runs
+                elapsed = float("inf")
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    infer(people)
+                    elapsed = min(elapsed, time.perf_counter() - start)
+                print(f"{filename:<18} {name:<12} {counts[0]:>8,} {counts[1]:>8,} "
+                      f"{peak / 1024:>9.1f} {elapsed:>8.4f}")
+    finally:
+        heredity.log_joint_probability = log_joint_probability
+
+
+def benchmark_sampling(args):
+    """
+    Compares the sampling methods with exact junction tree marginals,
+    reporting the largest error and how many standard errors the
+    estimates are from the exact values on average.
+    """
+    print(f"{'people':>6} {'method':<11} {'workers':>7} {'seconds':>9} "
+          f"{'max error':>10} {'mean |z|':>9}")
+    for size in args.sizes:
+        people = synthetic_family(size, int(size * args.unknown_fraction), args.seed)
+        exact = elimination.infer(people)
+        for method in args.methods:
+            for workers in args.workers:
+                start = time.perf_counter()
+                estimates, errors = sampling.infer(people, method, args.samples, workers, args.seed)
+                elapsed = time.perf_counter() - start
+
+                z = [abs(estimates[person]["gene"][gene] - exact[person]["gene"][gene])
+                     / errors[person]["gene"][gene]
+                     for person in people for gene in exact[person]["gene"]
+                     if errors[person]["gene"][gene] > 0]
+                print(f"{size:>6} {method:<11} {workers:>7} {elapsed:>9.3f} "
+                      f"{largest_difference(exact, estimates):>10.4f} {numpy.mean(z):>9.2f}")
+
+
+def benchmark_batch(args):
+    """
+    Compares scoring a directory of family files one interpreter per
+    file with the batch runner, with and without reusing compiled models.
+    """
+    rng = random.Random(args.seed)
+    templates = [synthetic_family(args.size, args.size // 2, seed)
+                 for seed in range(args.shapes)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Families of a few shapes, each with its own traits
+        for i in range(args.families):
+            people = {name: dict(person) for name, person in rng.choice(templates).items()}
+            for person in people.values():
+                person["trait"] = rng.choice([True, False, None])
+            write_family(os.path.join(directory, f"family{i:05}.csv"), people)
+        paths = batch.family_files(directory)
+
+        print(f"{args.families} families of {args.size} people in {args.shapes} shapes")
+        print(f"{'runner':<27} {'workers':>7} {'seconds':>9} {'families/sec':>13}")
+
+        # Starting an interpreter per file is slow, so time only a few
+        sample = paths[:args.subprocesses]
+        start = time.perf_counter()
+        for path in sample:
+            subprocess.run([sys.executable, "elimination.py", path], check=True,
+                           stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        estimate = elapsed * len(paths) / len(sample)
+        print(f"{'interpreter per file (est.)':<27} {1:>7} {estimate:>9.2f} "
+              f"{len(sample) / elapsed:>13.1f}")
+
+        for reuse in (False, True):
+            for workers in args.workers:
+                batch.models.clear()
+                batch.reuse_models = reuse
+                start = time.perf_counter()
+                for _ in batch.score_all(paths, workers):
+                    pass
+                elapsed = time.perf_counter() - start
+                runner = "batch, reused models" if reuse else "batch"
+                print(f"{runner:<27} {workers:>7} {elapsed:>9.2f} {len(paths) / elapsed:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+
+    enumerating = benchmarks.add_parser("enumeration", help="compare exact inference engines")
+    enumerating.add_argument("--sizes", nargs="+", type=int, default=[6, 7, 8, 9])
+    enumerating.add_argument("--unknown", type=int, default=2)
+    enumerating.add_argument("--repeat", type=int, default=3)
+    enumerating.add_argument("--seed", type=int, default=0)
+    enumerating.set_defaults(run=benchmark_enumeration)
+
+    pruning = benchmarks.add_parser("pruning", help="compare enumeration before and after pruning")
+    pruning.add_argument("families", nargs="*",
+                         default=["data/family0.csv", "data/family1.csv", "data/family2.csv"])
+    pruning.add_argument("--repeat", type=int, default=3)
+    pruning.set_defaults(run=benchmark_pruning)
+
+    sampling_methods = benchmarks.add_parser("sampling", help="compare approximate inference")
+    sampling_methods.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 300])
+    sampling_methods.add_argument("--unknown-fraction", type=float, default=0.5)
+    sampling_methods.add_argument("--methods", nargs="+", choices=list(sampling.METHODS),
+                                  default=list(sampling.METHODS))
+    sampling_methods.add_argument("--samples", type=int, default=100000)
+    sampling_methods.add_argument("--workers", nargs="+", type=int, default=[1, 4])
+    sampling_methods.add_argument("--seed", type=int, default=0)
+    sampling_methods.set_defaults(run=benchmark_sampling)
+
+    batching = benchmarks.add_parser("batch", help="compare ways of scoring many family files")
+    batching.add_argument("--families", type=int, default=2000)
+    batching.add_argument("--size", type=int, default=30)
+    batching.add_argument("--shapes", type=int, default=10)
+    batching.add_argument("--subprocesses", type=int, default=20)
+    batching.add_argument("--workers", nargs="+", type=int, default=[1, 4])
+    batching.add_argument("--seed", type=int, default=0)
+    batching.set_defaults(run=benchmark_batch)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
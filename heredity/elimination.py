@@ -0,0 +1,273 @@
+import sys
+
+import numpy
+
+from heredity import PROBS, load_data, has_parents, inheritance_table, print_probabilities
+
+# Gene counts, in the order used by every factor axis
+GENES = (0, 1, 2)
+
+# Most factors multiplied by a single call to numpy.einsum
+OPERANDS = 16
+
+
+def trait_likelihood(trait):
+    """
+    Return, for each gene count, the probability of the observed `trait`,
+    or all ones if the trait is unknown.
+    """
+    if trait is None:
+        return numpy.ones(len(GENES))
+    return numpy.array([PROBS["trait"][gene][trait] for gene in GENES])
+
+
+class Factor():
+    """
+    Non-negative function of the gene counts of some people:
+    `values` has one axis of length 3 per person in `variables`.
+    """
+
+    def __init__(self, variables, values):
+        self.variables = tuple(variables)
+        self.values = values
+
+
+def family_shape(people):
+    """
+    Return the shape of the family in `people`: for each person in turn,
+    the positions of their mother and father, or None if unknown.
+    Families of the same shape differ only in names and traits.
+    """
+    index = {person: i for i, person in enumerate(people)}
+    return tuple(
+        (index[people[person]["mother"]], index[people[person]["father"]])
+        if has_parents(people, person) else None
+        for person in people
+    )
+
+
+def compile_network(people):
+    """
+    Compile the family in `people` into the factors of a Bayesian network
+    over each person's gene count, with observed traits folded in as
+    evidence. Unobserved traits depend on nothing but their own person's
+    gene, so they need no factor of their own.
+
+    The `i`th person is variable `i`, and has the `i`th factor.
+    """
+    inheritance = inheritance_table(PROBS["mutation"])
+    prior = numpy.array([PROBS["gene"][gene] for gene in GENES])
+    factors = []
+    for i, (person, parents) in enumerate(zip(people, family_shape(people))):
+        evidence = trait_likelihood(people[person]["trait"])
+        if parents is None:
+            factors.append(Factor((i,), prior * evidence))
+        else:
+            factors.append(Factor(parents + (i,), inheritance * evidence))
+    return factors
+
+
+def elimination_order(factors):
+    """
+    Return an order in which to eliminate every variable of `factors`,
+    chosen greedily to add the fewest new edges between variables
+    (min-fill), which keeps the intermediate factors small.
+    """
+    neighbors = {}
+    for factor in factors:
+        for variable in factor.variables:
+            neighbors.setdefault(variable, set()).update(factor.variables)
+    for variable in neighbors:
+        neighbors[variable].discard(variable)
+
+    def fill(variable):
+        adjacent = list(neighbors[variable])
+        return sum(
+            1
+            for i, first in enumerate(adjacent)
+            for second in adjacent[i + 1:]
+            if second not in neighbors[first]
+        )
+
+    order = []
+    while neighbors:
+        variable = min(neighbors, key=lambda v: (fill(v), len(neighbors[v])))
+        adjacent = neighbors.pop(variable)
+        for first in adjacent:
+            neighbors[first].discard(variable)
+            neighbors[first].update(adjacent - {first})
+        order.append(variable)
+    return order
+
+
+def multiply(factors, eliminate=()):
+    """
+    Return the product of `factors`, summing out the variables in
+    `eliminate`. The result is rescaled so that its largest value is 1,
+    which leaves every marginal unchanged but stops long products of
+    small probabilities from underflowing.
+    """
+    if not factors:
+        return Factor((), numpy.array(1.0))
+
+    # einsum takes a limited number of operands, so fold long products first
+    while len(factors) > OPERANDS:
+        factors = [multiply(factors[:OPERANDS])] + factors[OPERANDS:]
+
+    variables = []
+    for factor in factors:
+        for variable in factor.variables:
+            if variable not in variables:
+                variables.append(variable)
+    kept = [variable for variable in variables if variable not in eliminate]
+
+    axes = {variable: i for i, variable in enumerate(variables)}
+    operands = []
+    for factor in factors:
+        operands += [factor.values, [axes[variable] for variable in factor.variables]]
+    values = numpy.einsum(*operands, [axes[variable] for variable in kept])
+
+    largest = values.max()
+    if largest > 0:
+        values = values / largest
+    return Factor(kept, values)
+
+
+class Cluster():
+    """
+    Node of a junction tree: the step of variable elimination that sums
+    out `variable` from the product of the factors numbered in `factors`
+    and of the messages from the clusters in `children`, passing what is
+    left on to `parent`. Clusters are numbered by `index`, children first.
+
+    Clusters hold only the structure of the tree, so one tree serves
+    any factors over the same variables.
+    """
+
+    def __init__(self, index, variable, factors, children, variables):
+        self.index = index
+        self.variable = variable
+        self.factors = factors
+        self.children = children
+        self.variables = variables
+        self.separator = variables - {variable}
+        self.parent = None
+
+
+def junction_tree(factors, order):
+    """
+    Return the clusters of the junction tree that eliminating the
+    variables of `factors` in `order` builds, children before parents.
+    """
+    clusters = []
+
+    # Factors and messages not yet consumed, each with the variables it covers
+    pending = [(set(factor.variables), i, None) for i, factor in enumerate(factors)]
+    for variable in order:
+        involved = [entry for entry in pending if variable in entry[0]]
+        pending = [entry for entry in pending if variable not in entry[0]]
+        cluster = Cluster(
+            len(clusters),
+            variable,
+            [i for _, i, _ in involved if i is not None],
+            [child for _, _, child in involved if child is not None],
+            set().union(*(variables for variables, _, _ in involved))
+        )
+        for child in cluster.children:
+            child.parent = cluster
+        clusters.append(cluster)
+        pending.append((cluster.separator, None, cluster))
+    return clusters
+
+
+def calibrate(clusters, factors):
+    """
+    Pass messages up the junction tree and back down, returning lists
+    of each cluster's message to its parent and from it (None for roots),
+    after which each cluster has everything needed for its marginal.
+    """
+    up = [None] * len(clusters)
+    down = [None] * len(clusters)
+    for cluster in clusters:
+        incoming = [factors[i] for i in cluster.factors] + [up[child.index] for child in cluster.children]
+        up[cluster.index] = multiply(incoming, eliminate={cluster.variable})
+
+    for cluster in reversed(clusters):
+        for child in cluster.children:
+            incoming = [factors[i] for i in cluster.factors]
+            incoming += [up[other.index] for other in cluster.children if other is not child]
+            if down[cluster.index] is not None:
+                incoming.append(down[cluster.index])
+            down[child.index] = multiply(incoming, eliminate=cluster.variables - child.separator)
+    return up, down
+
+
+def gene_marginal(cluster, factors, up, down):
+    """
+    Return the distribution over the gene count of the variable
+    eliminated by `cluster`, given the evidence, from the messages
+    returned by `calibrate`.
+    """
+    incoming = [factors[i] for i in cluster.factors] + [up[child.index] for child in cluster.children]
+    if down[cluster.index] is not None:
+        incoming.append(down[cluster.index])
+    values = multiply(incoming, eliminate=cluster.variables - {cluster.variable}).values
+    return values / values.sum()
+
+
+class FamilyModel():
+    """
+    Junction tree compiled for one shape of family (see `family_shape`),
+    which answers every family of that shape whatever their traits.
+    """
+
+    def __init__(self, people):
+        self.shape = family_shape(people)
+        factors = compile_network(people)
+        self.clusters = junction_tree(factors, elimination_order(factors))
+
+    def infer(self, people):
+        """
+        Return the gene and trait distribution of every person in `people`,
+        a family of this model's shape, in the same form as `main` in
+        heredity.py computes by enumeration.
+        """
+        factors = compile_network(people)
+        up, down = calibrate(self.clusters, factors)
+        marginals = {
+            cluster.variable: gene_marginal(cluster, factors, up, down)
+            for cluster in self.clusters
+        }
+
+        probabilities = {}
+        for i, person in enumerate(people):
+            genes = marginals[i]
+            trait = people[person]["trait"]
+            if trait is None:
+                have_trait = sum(genes[gene] * PROBS["trait"][gene][True] for gene in GENES)
+            else:
+                have_trait = 1.0 if trait else 0.0
+            probabilities[person] = {
+                "gene": {gene: float(genes[gene]) for gene in reversed(GENES)},
+                "trait": {True: float(have_trait), False: float(1 - have_trait)}
+            }
+        return probabilities
+
+
+def infer(people):
+    """
+    Return the gene and trait distribution of every person in `people`,
+    in the same form as `main` in heredity.py computes by enumeration.
+    """
+    return FamilyModel(people).infer(people)
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python elimination.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, infer(people))
+
+
+if __name__ == "__main__":
+    main()
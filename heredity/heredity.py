@@ -1,5 +1,7 @@
 import csv
+import functools
 import itertools
+import math
 import sys
 import random
 import numpy
@@ -45,22 +47,21 @@ def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python heredity.py data.csv")
     people = load_data(sys.argv[1])
+    probabilities = pruned_probabilities(people)
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
-        person: {
-            "gene": {
-                2: 0,
-                1: 0,
-                0: 0
-            },
-            "trait": {
-                True: 0,
-                False: 0
-            }
-        }
-        for person in people
-    }
+    # Print results
+    print_probabilities(people, probabilities)
+
+
+def enumerate_probabilities(people):
+    """
+    Return the gene and trait distribution of every person in `people`,
+    by summing the joint probability of every assignment of genes and
+    traits consistent with the known traits.
+    """
+
+    # Keep track of log gene and trait probabilities for each person
+    probabilities = empty_probabilities(people, -math.inf)
 
     # Loop over all sets of people who might have the trait
     names = set(people)
@@ -80,20 +81,134 @@ def main():
             for two_genes in powerset(names - one_gene):
 
                 # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+                log_p = log_joint_probability(people, one_gene, two_genes, have_trait)
+                log_update(probabilities, one_gene, two_genes, have_trait, log_p)
 
     # Ensure probabilities sum to 1
-    normalize(probabilities)
+    log_normalize(probabilities)
+    return probabilities
 
-    # Print results
+
+def pruned_probabilities(people):
+    """
+    Return the same distributions as `enumerate_probabilities`, but
+    enumerating far fewer assignments, one at a time as they are needed.
+
+    Only traits that are not known are enumerated. People who are nobody's
+    parent are not enumerated at all: once their parents' genes are fixed
+    their own gene and trait affect no one else, so their few possible
+    values are summed on the spot for each assignment of everyone else.
+    """
+    probabilities = empty_probabilities(people, -math.inf)
+
+    parents = {
+        people[person][parent]
+        for person in people
+        for parent in ("mother", "father")
+        if people[person][parent] is not None
+    }
+    core = {person: people[person] for person in people if person in parents}
+    leaves = [person for person in people if person not in parents]
+    core_probabilities = {person: probabilities[person] for person in core}
+
+    # Log joint probabilities of each leaf's own values and their total,
+    # by the leaf's parents' genes
+    outcomes = {}
+
+    for one_gene, two_genes in gene_assignments(core):
+        for have_trait in trait_assignments(core):
+            log_p = log_joint_probability(core, one_gene, two_genes, have_trait)
+
+            given = []
+            for leaf in leaves:
+                key = (leaf, gene_count(people[leaf]["mother"], one_gene, two_genes),
+                       gene_count(people[leaf]["father"], one_gene, two_genes))
+                if key not in outcomes:
+                    leaf_outcome = leaf_outcomes(people, leaf, one_gene, two_genes)
+                    outcomes[key] = (leaf_outcome, log_sum_exp(leaf_outcome.values()))
+                given.append(outcomes[key])
+                log_p += outcomes[key][1]
+
+            log_update(core_probabilities, one_gene, two_genes, have_trait, log_p)
+            for leaf, (leaf_outcome, log_total) in zip(leaves, given):
+                for (gene_number, trait), log_q in leaf_outcome.items():
+                    log_leaf = log_p + log_q - log_total
+                    genes = probabilities[leaf]["gene"]
+                    traits = probabilities[leaf]["trait"]
+                    genes[gene_number] = log_add(genes[gene_number], log_leaf)
+                    traits[trait] = log_add(traits[trait], log_leaf)
+
+    # Ensure probabilities sum to 1
+    log_normalize(probabilities)
+    return probabilities
+
+
+def gene_count(person, one_gene, two_genes):
+    """
+    Return how many copies of the gene `person` has, or None for no one.
+    """
+    if person is None:
+        return None
+    return 1 if person in one_gene else 2 if person in two_genes else 0
+
+
+def leaf_outcomes(people, leaf, one_gene, two_genes):
+    """
+    Return a dictionary mapping each (gene count, trait) pair that `leaf`
+    might have to its log joint probability, given the genes of their
+    parents in `one_gene` and `two_genes`.
+    """
+    person = {leaf: people[leaf]}
+    outcomes = {}
+    for gene_number in (0, 1, 2):
+        for trait in trait_assignments(person):
+            outcomes[gene_number, bool(trait)] = log_joint_probability(
+                person,
+                one_gene | ({leaf} if gene_number == 1 else set()),
+                two_genes | ({leaf} if gene_number == 2 else set()),
+                trait
+            )
+    return outcomes
+
+
+def empty_probabilities(people, value=0):
+    """
+    Return gene and trait distributions for each person in `people`,
+    with every probability `value`, ready to be accumulated by `update`
+    (or by `log_update`, starting from a value of -inf).
+    """
+    return {
+        person: {
+            "gene": {
+                2: value,
+                1: value,
+                0: value
+            },
+            "trait": {
+                True: value,
+                False: value
+            }
+        }
+        for person in people
+    }
+
+
+def print_probabilities(people, probabilities, errors=None):
+    """
+    Print each person's gene and trait distributions from `probabilities`,
+    and if given, the standard error of each estimate from `errors`,
+    which has the same form.
+    """
     for person in people:
         print(f"{person}:")
         for field in probabilities[person]:
             print(f"  {field.capitalize()}:")
             for value in probabilities[person][field]:
                 p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    print(f"    {value}: {p:.4f} ± {errors[person][field][value]:.4f}")
 
 
 def load_data(filename):
@@ -130,6 +245,30 @@ def powerset(s):
     ]
 
 
+def gene_assignments(names):
+    """
+    Generate, one at a time, every pair of sets (one_gene, two_genes)
+    of people in `names` who might have one or two copies of the gene.
+    """
+    names = list(names)
+    for genes in itertools.product((0, 1, 2), repeat=len(names)):
+        one_gene = {name for name, gene in zip(names, genes) if gene == 1}
+        two_genes = {name for name, gene in zip(names, genes) if gene == 2}
+        yield one_gene, two_genes
+
+
+def trait_assignments(people):
+    """
+    Generate, one at a time, every set of people in `people` who might
+    have the trait, given the traits that are already known.
+    """
+    known = {person for person in people if people[person]["trait"]}
+    unknown = [person for person in people if people[person]["trait"] is None]
+    for r in range(len(unknown) + 1):
+        for have_trait in itertools.combinations(unknown, r):
+            yield known | set(have_trait)
+
+
 def has_parents(people, person):
     """
     Return boolean value describing whether a person's parents are documented in the csv
@@ -137,6 +276,40 @@ def has_parents(people, person):
     return people[person]['mother'] != None and people[person]['father'] != None
 
 
+@functools.lru_cache(maxsize=None)
+def inheritance_table(mutation):
+    """
+    Return an array whose entry [m, f, c] is the probability that a child
+    of parents with `m` and `f` copies of the gene has `c` copies, when
+    each copy passed on mutates with probability `mutation`.
+
+    The table is built once per mutation probability and shared by every
+    inference engine, so it must not be modified.
+    """
+    # Probability that a parent with each number of copies passes one on
+    passes = numpy.array([mutation, 0.5, 1 - mutation])
+    mother = passes[:, None]
+    father = passes[None, :]
+    table = numpy.stack([
+        (1 - mother) * (1 - father),
+        mother * (1 - father) + father * (1 - mother),
+        mother * father
+    ], axis=-1)
+    table.flags.writeable = False
+    return table
+
+
+@functools.lru_cache(maxsize=None)
+def log_inheritance_table(mutation):
+    """
+    Return the logarithm of `inheritance_table(mutation)` as nested lists,
+    which are quicker than an array to index one entry at a time.
+    """
+    # Impossible inheritances, as with no mutation, have a logarithm of -inf
+    with numpy.errstate(divide="ignore"):
+        return numpy.log(inheritance_table(mutation)).tolist()
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -148,91 +321,35 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
-    p = 0
-
-    # List of probabilities for each person
-    probabilities = []
+    return math.exp(log_joint_probability(people, one_gene, two_genes, have_trait))
 
-    for person in people:
 
-        if person in one_gene:
-            gene_number = 1
-        elif person in two_genes:
-            gene_number = 2
-        else:
-            gene_number = 0
+def log_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    Return the logarithm of `joint_probability`, summed from the
+    logarithm of each person's factors so that large families,
+    whose joint probabilities are tiny, do not underflow to 0.
+    """
+    log_inheritance = log_inheritance_table(PROBS["mutation"])
+    log_p = 0
 
-        if person in have_trait:
-            trait = True
-        else:
-            trait = False
+    for person in people:
+        gene_number = gene_count(person, one_gene, two_genes)
+        trait = person in have_trait
 
         # If person has no parents listed, take the probabilities from the PROBS dict
         if not has_parents(people, person):
+            log_p += math.log(PROBS["gene"][gene_number])
 
-            gene_prob = PROBS["gene"][gene_number]
-            trait_prob = PROBS["trait"][gene_number][trait]
-
-            probabilities.append(gene_prob * trait_prob)
-            continue
-
-        # If person has parents:
-        # Getting parent's names
-        mother = people[person]['mother']
-        father = people[person]['father']
-
-        # Number of target genes each parent has
-        mother_gene = 1 if mother in one_gene else 2 if mother in two_genes else 0
-        father_gene = 1 if father in one_gene else 2 if father in two_genes else 0
-
-        # Mother has 0 copies of target gene
-        if not mother_gene:
-            mother_prob = PROBS["mutation"]
-
-        # Mother has 1 copy
-        elif mother_gene == 1:
-            # 50/50 chance whether the target gene or the other gene will be passed down
-            mother_prob = 0.5
-
-        # father has 2 copies
-        else:
-            # Equal to 1 - mutation factor
-            mother_prob = 1 - PROBS["mutation"]
-
-        # father has 0 copies of target gene
-        if not father_gene:
-            father_prob = PROBS["mutation"]
-
-            # father has 1 copy
-        elif father_gene == 1:
-            # 50/50 chance whether the target gene or the other copy will be passed down
-            father_prob = 0.5
-
-        # father has 2 copies
+        # Otherwise look up the chance of inheriting that many copies from the parents
         else:
-            # Equal to 1 - mutation factor
-            father_prob = 1 - PROBS["mutation"]
-
-        # ONE GENE: Either gets the gene from mother and not from father, or gets from father and not from mother
-        if person in one_gene:
-            # P(ChildGene = 1 | P(MotherGene), P(FatherGene))
-            gene_prob = (mother_prob * (1 - father_prob)) + (father_prob * (1 - mother_prob))
+            mother_gene = gene_count(people[person]["mother"], one_gene, two_genes)
+            father_gene = gene_count(people[person]["father"], one_gene, two_genes)
+            log_p += log_inheritance[mother_gene][father_gene][gene_number]
 
-        # TWO GENES: Person needs a target gene from both parents
-        elif person in two_genes:
-            # Probability of mother gene AND father gene
-            gene_prob = (mother_prob * father_prob)
-
-        # 0 GENES: Person needs to NOT get the gene from either their mother or their father
-        else:
-            # Probability of not mother gene and not father gene
-            gene_prob = (1 - mother_prob) * (1 - father_prob)
+        log_p += math.log(PROBS["trait"][gene_number][trait])
 
-        trait_prob = PROBS["trait"][gene_number][trait]
-
-        probabilities.append(gene_prob * trait_prob)
-
-    return numpy.prod(probabilities)
+    return log_p
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -251,6 +368,57 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
         probabilities[person]["trait"][trait] += p
 
 
+def log_update(log_probabilities, one_gene, two_genes, have_trait, log_p):
+    """
+    Like `update`, but for distributions held as logarithms:
+    adds a new joint probability whose logarithm is `log_p`.
+    """
+    for person in log_probabilities:
+
+        gene_number = 1 if person in one_gene else 2 if person in two_genes else 0
+        trait = True if person in have_trait else False
+
+        genes = log_probabilities[person]["gene"]
+        traits = log_probabilities[person]["trait"]
+        genes[gene_number] = log_add(genes[gene_number], log_p)
+        traits[trait] = log_add(traits[trait], log_p)
+
+
+def log_add(a, b):
+    """
+    Return the logarithm of exp(`a`) + exp(`b`) without leaving log space.
+    """
+    if a < b:
+        a, b = b, a
+    if b == -math.inf:
+        return a
+    return a + math.log1p(math.exp(b - a))
+
+
+def log_sum_exp(values):
+    """
+    Return the logarithm of the sum of the exponentials of `values`,
+    shifting by the largest first so that none of them underflows.
+    """
+    values = list(values)
+    largest = max(values)
+    if largest == -math.inf:
+        return largest
+    return largest + math.log(sum(math.exp(value - largest) for value in values))
+
+
+def log_normalize(log_probabilities):
+    """
+    Update `log_probabilities`, whose distributions are held as
+    logarithms, to the normalized probabilities they stand for.
+    """
+    for person in log_probabilities:
+        for distribution in log_probabilities[person].values():
+            total = log_sum_exp(distribution.values())
+            for value in distribution:
+                distribution[value] = math.exp(distribution[value] - total)
+
+
 def normalize(probabilities):
     """
     Update `probabilities` such that each probability distribution
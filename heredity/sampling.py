@@ -0,0 +1,420 @@
+import argparse
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from elimination import GENES
+from heredity import load_data, print_probabilities
+from vectorized import FamilyTables
+
+# Samples drawn together in one batch by likelihood weighting
+BATCH_SIZE = 1 << 12
+
+
+def birth_order(tables):
+    """
+    Return the columns of `tables` ordered so that everyone comes
+    after their parents, as forward sampling needs.
+    """
+    order = []
+    placed = numpy.zeros(tables.n, dtype=bool)
+
+    def place(i):
+        if placed[i]:
+            return
+        placed[i] = True
+        if tables.mothers[i] != -1:
+            place(tables.mothers[i])
+            place(tables.fathers[i])
+        order.append(i)
+
+    for i in range(tables.n):
+        place(i)
+    return order
+
+
+def draw(log_weights, rng):
+    """
+    Return one draw of 0, 1 or 2 for every position of the three arrays
+    `log_weights`, each with probability proportional to the exponential
+    of its entry. Working on one whole array per gene count avoids
+    reducing over a tiny axis, which NumPy does slowly.
+    """
+    zero, one, two = log_weights
+    largest = numpy.maximum(numpy.maximum(zero, one), two)
+    zero = numpy.exp(zero - largest)
+    one = zero + numpy.exp(one - largest)
+    two = one + numpy.exp(two - largest)
+    u = rng.random(two.shape) * two
+    return (u >= zero).astype(numpy.int64) + (u >= one)
+
+
+def forward_sample(tables, size, rng):
+    """
+    Return `size` samples of everyone's gene count, each drawn from
+    their parents' gene counts (or the prior), ignoring the traits.
+    """
+    prior = numpy.exp(tables.log_prior).cumsum()
+    inheritance = numpy.exp(tables.log_inheritance).cumsum(axis=-1)
+    genes = numpy.zeros((size, tables.n), dtype=numpy.int64)
+    for i in birth_order(tables):
+        if tables.mothers[i] == -1:
+            cumulative = prior[None, :]
+        else:
+            cumulative = inheritance[genes[:, tables.mothers[i]], genes[:, tables.fathers[i]]]
+        u = rng.random(size) * cumulative[:, -1]
+        genes[:, i] = (u[:, None] >= cumulative[:, :-1]).sum(axis=1)
+    return genes
+
+
+def trait_probabilities(tables, genes):
+    """
+    Return, for every sample in `genes`, each person's probability
+    of having the trait: their known trait if there is one, otherwise
+    the chance of the trait given their sampled gene count.
+    """
+    have_trait = numpy.exp(tables.log_trait[:, 1])[genes]
+    known = numpy.flatnonzero(tables.known)
+    have_trait[:, known] = tables.observed[known]
+    return have_trait
+
+
+class WeightedTotals():
+    """
+    Running weighted sums of gene indicators and trait probabilities over
+    weighted samples, for self-normalized importance sampling estimates.
+
+    Weights are kept divided by exp(shift), the largest weight so far,
+    and squared weights by exp(2 * shift), so that none underflow.
+    """
+
+    def __init__(self, n):
+        self.shift = -math.inf
+        self.weight = 0
+        self.squared_weight = 0
+        self.genes = numpy.zeros((n, len(GENES)))
+        self.squared_genes = numpy.zeros((n, len(GENES)))
+        self.traits = numpy.zeros(n)
+        self.squared_traits = numpy.zeros(n)
+        self.squared_traits_squared = numpy.zeros(n)
+        self.samples = 0
+
+    def rescale(self, shift):
+        """Re-express the sums relative to a larger `shift`."""
+        if shift <= self.shift:
+            return
+        first = math.exp(self.shift - shift) if self.shift > -math.inf else 0
+        second = first ** 2
+        self.weight *= first
+        self.genes *= first
+        self.traits *= first
+        self.squared_weight *= second
+        self.squared_genes *= second
+        self.squared_traits *= second
+        self.squared_traits_squared *= second
+        self.shift = shift
+
+    def add(self, log_weights, genes, have_trait):
+        """
+        Add samples with the given log weights, sampled gene counts,
+        and probabilities of each person having the trait.
+        """
+        self.samples += len(log_weights)
+        largest = log_weights.max()
+        if largest == -math.inf:
+            return
+        self.rescale(largest)
+        weights = numpy.exp(log_weights - self.shift)
+        squared = weights ** 2
+
+        self.weight += weights.sum()
+        self.squared_weight += squared.sum()
+        n = len(self.traits)
+        indices = (genes * n + numpy.arange(n)).ravel()
+        self.genes += numpy.bincount(indices, weights=numpy.repeat(weights, n),
+                                     minlength=n * len(GENES)).reshape(len(GENES), n).T
+        self.squared_genes += numpy.bincount(indices, weights=numpy.repeat(squared, n),
+                                             minlength=n * len(GENES)).reshape(len(GENES), n).T
+        self.traits += weights @ have_trait
+        self.squared_traits += squared @ have_trait
+        self.squared_traits_squared += squared @ have_trait ** 2
+
+    def merge(self, other):
+        """Add the samples summed in `other`, another WeightedTotals."""
+        self.samples += other.samples
+        if other.shift == -math.inf:
+            return
+        self.rescale(other.shift)
+        first = math.exp(other.shift - self.shift)
+        second = first ** 2
+        self.weight += other.weight * first
+        self.genes += other.genes * first
+        self.traits += other.traits * first
+        self.squared_weight += other.squared_weight * second
+        self.squared_genes += other.squared_genes * second
+        self.squared_traits += other.squared_traits * second
+        self.squared_traits_squared += other.squared_traits_squared * second
+
+    def estimates(self):
+        """
+        Return each person's estimated gene distributions and trait
+        probabilities, and their standard errors, using the delta-method
+        variance of a ratio of weighted sums.
+        """
+        genes = self.genes / self.weight
+        traits = self.traits / self.weight
+
+        # Sum of w^2 (x - mean)^2, expanded; indicators equal their squares
+        gene_spread = self.squared_genes * (1 - 2 * genes) + genes ** 2 * self.squared_weight
+        trait_spread = (self.squared_traits_squared - 2 * traits * self.squared_traits
+                        + traits ** 2 * self.squared_weight)
+        gene_errors = numpy.sqrt(numpy.clip(gene_spread, 0, None)) / self.weight
+        trait_errors = numpy.sqrt(numpy.clip(trait_spread, 0, None)) / self.weight
+        return genes, traits, gene_errors, trait_errors
+
+
+def likelihood_weighting(people, samples, seed=None):
+    """
+    Return a WeightedTotals of `samples` draws by likelihood weighting:
+    everyone's gene count is sampled from their parents' (or the prior),
+    a batch of samples at a time, and each sample is weighted by the
+    probability of the known traits given its gene counts.
+
+    With many known traits a few samples take nearly all the weight,
+    and both the estimates and their errors become unreliable; Gibbs
+    sampling copes better with large pedigrees.
+    """
+    tables = FamilyTables(people)
+    rng = numpy.random.default_rng(seed)
+    totals = WeightedTotals(tables.n)
+    known = numpy.flatnonzero(tables.known)
+    observed = tables.observed[known].astype(numpy.int64)
+
+    for start in range(0, samples, BATCH_SIZE):
+        genes = forward_sample(tables, min(BATCH_SIZE, samples - start), rng)
+        log_weights = tables.log_trait[genes[:, known], observed].sum(axis=1)
+        totals.add(log_weights, genes, trait_probabilities(tables, genes))
+    return totals
+
+
+class ChainTotals():
+    """
+    Each of a set of independent Gibbs chains' own estimates of the gene
+    distributions and trait probabilities, averaged over its kept sweeps.
+    """
+
+    def __init__(self, genes, traits):
+        self.genes = genes
+        self.traits = traits
+
+    def merge(self, other):
+        """Add the chains of `other`, another ChainTotals."""
+        self.genes = numpy.concatenate((self.genes, other.genes))
+        self.traits = numpy.concatenate((self.traits, other.traits))
+
+    def estimates(self):
+        """
+        Return each person's estimated gene distributions and trait
+        probabilities, and their standard errors, taken from the spread
+        of the estimates of the independent chains (or NaN for one chain).
+        """
+        chains = len(self.genes)
+        if chains == 1:
+            return (self.genes[0], self.traits[0],
+                    numpy.full_like(self.genes[0], numpy.nan),
+                    numpy.full_like(self.traits[0], numpy.nan))
+        return (self.genes.mean(axis=0), self.traits.mean(axis=0),
+                self.genes.std(axis=0, ddof=1) / math.sqrt(chains),
+                self.traits.std(axis=0, ddof=1) / math.sqrt(chains))
+
+
+def color_groups(tables):
+    """
+    Return groups of columns of `tables` such that no two people in a
+    group share a factor of the network: neither is the other's parent
+    and they have no child together. Everyone in a group can then be
+    resampled at once, since none of their conditionals involve another.
+    """
+    neighbors = [set() for _ in range(tables.n)]
+    for child in tables.children:
+        family = {child, tables.mothers[child], tables.fathers[child]}
+        for person in family:
+            neighbors[person] |= family - {person}
+
+    # Greedy colouring, most constrained people first
+    colors = {}
+    for person in sorted(range(tables.n), key=lambda i: -len(neighbors[i])):
+        taken = {colors[other] for other in neighbors[person] if other in colors}
+        colors[person] = next(color for color in range(tables.n) if color not in taken)
+
+    groups = {}
+    for person, color in colors.items():
+        groups.setdefault(color, []).append(person)
+    return [numpy.array(sorted(group)) for group in groups.values()]
+
+
+class GroupUpdate():
+    """
+    Everything needed to resample the gene counts of one colour group of
+    people at once: their parents, if known, the evidence of their traits,
+    and each link to one of their children, with the child's other parent.
+    """
+
+    def __init__(self, tables, members, evidence):
+        self.members = members
+        position = {person: k for k, person in enumerate(members)}
+        self.founders = numpy.flatnonzero(tables.mothers[members] == -1)
+        self.descendants = numpy.flatnonzero(tables.mothers[members] != -1)
+        self.mothers = tables.mothers[members[self.descendants]]
+        self.fathers = tables.fathers[members[self.descendants]]
+        self.evidence = evidence[members].T[:, None, :]
+
+        # Links to children, grouped by the member they belong to
+        links = sorted(
+            [(position[tables.mothers[child]], 0, child, tables.fathers[child])
+             for child in tables.children if tables.mothers[child] in position] +
+            [(position[tables.fathers[child]], 1, child, tables.mothers[child])
+             for child in tables.children if tables.fathers[child] in position]
+        )
+        positions, roles, children, others = (numpy.array(column, dtype=numpy.int64)
+                                              for column in zip(*links)) if links else [[]] * 4
+        self.linked, self.starts = numpy.unique(positions, return_index=True)
+        self.roles = numpy.asarray(roles, dtype=numpy.int64)
+        self.children = numpy.asarray(children, dtype=numpy.int64)
+        self.others = numpy.asarray(others, dtype=numpy.int64)
+
+    def log_weights(self, tables, genes):
+        """
+        Return, for each gene count, an array of the log probability of
+        every member in every chain of `genes` having that many copies
+        given everyone else's genes, up to a constant.
+        """
+        # Inheritance tables with a row per own gene count, and a column
+        # per pair of parents' counts, or as a mother or as a father, per
+        # pair of the other parent's and the child's counts
+        as_child = tables.log_inheritance.transpose(2, 0, 1).reshape(len(GENES), -1)
+        as_parent = numpy.concatenate((
+            tables.log_inheritance.reshape(len(GENES), -1),
+            tables.log_inheritance.transpose(1, 0, 2).reshape(len(GENES), -1)
+        ), axis=1)
+
+        log_weights = numpy.empty((len(GENES), len(genes), len(self.members)))
+        log_weights[:, :, self.founders] = tables.log_prior[:, None, None]
+        parents = genes[:, self.mothers] * len(GENES) + genes[:, self.fathers]
+        log_weights[:, :, self.descendants] = as_child.take(parents, axis=1)
+        log_weights += self.evidence
+
+        if len(self.children):
+            pairs = (self.roles * len(GENES) ** 2
+                     + genes[:, self.others] * len(GENES) + genes[:, self.children])
+            links = as_parent.take(pairs, axis=1)
+            log_weights[:, :, self.linked] += numpy.add.reduceat(links, self.starts, axis=2)
+        return log_weights
+
+
+def gibbs_sampling(people, samples, sweeps=100, burn_in=100, seed=None):
+    """
+    Return a ChainTotals from Gibbs sampling with enough chains run side
+    by side that keeping `sweeps` sweeps of each, after `burn_in` sweeps,
+    gives about `samples` samples in all.
+
+    Each sweep resamples every person's gene count from its distribution
+    given everyone else's: their parents' genes (or the prior), their
+    known trait, and their children and the children's other parents.
+    People who share no factor are resampled together, a colour group
+    at a time.
+    """
+    tables = FamilyTables(people)
+    rng = numpy.random.default_rng(seed)
+    chains = max(1, math.ceil(samples / sweeps))
+
+    evidence = numpy.zeros((tables.n, len(GENES)))
+    known = numpy.flatnonzero(tables.known)
+    evidence[known] = tables.log_trait[:, tables.observed[known].astype(numpy.int64)].T
+    updates = [GroupUpdate(tables, members, evidence) for members in color_groups(tables)]
+
+    # Start every chain from a forward sample of the genes
+    genes = forward_sample(tables, chains, rng)
+
+    gene_counts = numpy.zeros((chains, tables.n, len(GENES)))
+    trait_sums = numpy.zeros((chains, tables.n))
+    rows = numpy.arange(chains)
+    for sweep in range(burn_in + sweeps):
+        for update in updates:
+            genes[:, update.members] = draw(update.log_weights(tables, genes), rng)
+
+        if sweep >= burn_in:
+            gene_counts[rows[:, None], numpy.arange(tables.n), genes] += 1
+            trait_sums += trait_probabilities(tables, genes)
+
+    return ChainTotals(gene_counts / sweeps, trait_sums / sweeps)
+
+
+# Sampling methods selectable by name
+METHODS = {
+    "likelihood": likelihood_weighting,
+    "gibbs": gibbs_sampling,
+}
+
+
+def infer(people, method="likelihood", samples=100000, workers=1, seed=None, **options):
+    """
+    Return estimates of the gene and trait distribution of every person
+    in `people`, as computed exactly by heredity.py, and their standard
+    errors in the same form, from `samples` samples drawn with `method`.
+
+    The samples are split between `workers` processes, each with its
+    own independent random stream. Further `options` go to `method`.
+    """
+    sample = METHODS[method]
+    seeds = numpy.random.SeedSequence(seed).spawn(workers)
+    shares = [samples // workers + (k < samples % workers) for k in range(workers)]
+    if workers == 1:
+        results = [sample(people, samples, seed=seeds[0], **options)]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(sample, people, share, seed=worker_seed, **options)
+                       for share, worker_seed in zip(shares, seeds) if share > 0]
+            results = [future.result() for future in futures]
+
+    totals = results[0]
+    for result in results[1:]:
+        totals.merge(result)
+    genes, traits, gene_errors, trait_errors = totals.estimates()
+    names = list(people)
+    return (to_probabilities(names, genes, numpy.column_stack((1 - traits, traits))),
+            to_probabilities(names, gene_errors, numpy.column_stack((trait_errors, trait_errors))))
+
+
+def to_probabilities(names, genes, traits):
+    """
+    Return the values in arrays `genes`, with a column per gene count,
+    and `traits`, with columns for not having and having the trait,
+    and a row per person, in the form used by heredity.py.
+    """
+    return {
+        name: {
+            "gene": {gene: float(genes[i, gene]) for gene in reversed(GENES)},
+            "trait": {True: float(traits[i, 1]), False: float(traits[i, 0])}
+        }
+        for i, name in enumerate(names)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("data", help="family CSV, as for heredity.py")
+    parser.add_argument("--method", choices=list(METHODS), default="likelihood")
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    people = load_data(args.data)
+    probabilities, errors = infer(people, args.method, args.samples, args.workers, args.seed)
+    print_probabilities(people, probabilities, errors)
+
+
+if __name__ == "__main__":
+    main()
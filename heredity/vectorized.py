@@ -0,0 +1,141 @@
+import sys
+
+import numpy
+
+from elimination import GENES
+from heredity import PROBS, load_data, has_parents, inheritance_table, print_probabilities
+
+# Assignments scored together in one batch
+BATCH_SIZE = 1 << 16
+
+
+class FamilyTables():
+    """
+    Lookup tables for scoring assignments of `people`: column `i` of an
+    assignment array belongs to the `i`th person, and `mothers[i]` and
+    `fathers[i]` are the columns of their parents, or -1 if unknown.
+    """
+
+    def __init__(self, people):
+        self.names = list(people)
+        index = {person: i for i, person in enumerate(self.names)}
+        self.n = len(self.names)
+
+        self.mothers = numpy.full(self.n, -1)
+        self.fathers = numpy.full(self.n, -1)
+        for i, person in enumerate(self.names):
+            if has_parents(people, person):
+                self.mothers[i] = index[people[person]["mother"]]
+                self.fathers[i] = index[people[person]["father"]]
+        self.founders = numpy.flatnonzero(self.mothers == -1)
+        self.children = numpy.flatnonzero(self.mothers != -1)
+
+        # Known traits are fixed, unknown ones are enumerated
+        traits = [people[person]["trait"] for person in self.names]
+        self.known = numpy.array([trait is not None for trait in traits])
+        self.observed = numpy.array([bool(trait) for trait in traits])
+        self.unknown = numpy.flatnonzero(~self.known)
+
+        # Every factor is looked up as a logarithm, so that products
+        # over many people become sums that cannot underflow
+        with numpy.errstate(divide="ignore"):
+            self.log_prior = numpy.log([PROBS["gene"][gene] for gene in GENES])
+            self.log_inheritance = numpy.log(inheritance_table(PROBS["mutation"]))
+            self.log_trait = numpy.log([
+                [PROBS["trait"][gene][False], PROBS["trait"][gene][True]] for gene in GENES
+            ])
+
+    def count(self):
+        """Return the number of assignments consistent with the known traits."""
+        return len(GENES) ** self.n * 2 ** len(self.unknown)
+
+    def assignments(self, start, stop):
+        """
+        Return the gene and trait arrays of assignments `start` to `stop`.
+
+        Assignment `k` gives the `i`th person the `i`th base-3 digit of
+        `k` as their gene count, and the following binary digits of `k`
+        say which people with unknown traits have the trait.
+        """
+        numbers = numpy.arange(start, stop)
+        genes = numbers[:, None] // len(GENES) ** numpy.arange(self.n) % len(GENES)
+
+        traits = numpy.tile(self.observed, (stop - start, 1))
+        rest = numbers // len(GENES) ** self.n
+        traits[:, self.unknown] = (rest[:, None] >> numpy.arange(len(self.unknown))) & 1
+        return genes, traits
+
+    def log_joint_probabilities(self, genes, traits):
+        """
+        Return the log joint probability of every row of `genes` and `traits`,
+        as `log_joint_probability` in heredity.py would compute it for each.
+        """
+        factors = numpy.empty(genes.shape)
+        factors[:, self.founders] = self.log_prior[genes[:, self.founders]]
+        factors[:, self.children] = self.log_inheritance[
+            genes[:, self.mothers[self.children]],
+            genes[:, self.fathers[self.children]],
+            genes[:, self.children]
+        ]
+        factors += self.log_trait[genes, traits.astype(numpy.int64)]
+        return factors.sum(axis=1)
+
+
+def infer(people, batch_size=BATCH_SIZE):
+    """
+    Return the gene and trait distribution of every person in `people`,
+    as `enumerate_probabilities` in heredity.py computes it, but scoring
+    assignments a batch at a time with array operations.
+    """
+    tables = FamilyTables(people)
+    n = tables.n
+    offsets = numpy.arange(n)
+    gene_totals = numpy.zeros(n * len(GENES))
+    trait_totals = numpy.zeros(n * 2)
+
+    # Totals are kept divided by exp(shift), the largest probability so far,
+    # which is a streaming log-sum-exp: nothing added to them underflows
+    shift = -numpy.inf
+
+    for start in range(0, tables.count(), batch_size):
+        stop = min(start + batch_size, tables.count())
+        genes, traits = tables.assignments(start, stop)
+        log_p = tables.log_joint_probabilities(genes, traits)
+        largest = log_p.max()
+        if largest == -numpy.inf:
+            continue
+        if largest > shift:
+            gene_totals *= numpy.exp(shift - largest)
+            trait_totals *= numpy.exp(shift - largest)
+            shift = largest
+        p = numpy.repeat(numpy.exp(log_p - shift), n)
+
+        # Add each assignment's probability to every person's value in it
+        gene_totals += numpy.bincount((genes * n + offsets).ravel(), weights=p,
+                                      minlength=n * len(GENES))
+        trait_totals += numpy.bincount((traits * n + offsets).ravel(), weights=p,
+                                       minlength=n * 2)
+
+    gene_totals = gene_totals.reshape(len(GENES), n)
+    trait_totals = trait_totals.reshape(2, n)
+    gene_totals /= gene_totals.sum(axis=0)
+    trait_totals /= trait_totals.sum(axis=0)
+
+    return {
+        person: {
+            "gene": {gene: float(gene_totals[gene, i]) for gene in reversed(GENES)},
+            "trait": {True: float(trait_totals[1, i]), False: float(trait_totals[0, i])}
+        }
+        for i, person in enumerate(tables.names)
+    }
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python vectorized.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, infer(people))
+
+
+if __name__ == "__main__":
+    main()
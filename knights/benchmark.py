@@ -0,0 +1,277 @@
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+import logic
+from logic import (And, Biconditional, Implication, Not, Or, Sentence, Symbol,
+                   model_check, model_check_recursive)
+import sat
+
+
+def generate_puzzle(people, statements=2, seed=0):
+    """
+    Returns the knowledge of a generated knights and knaves puzzle with
+    `people` islanders, and the symbols it is about. Everyone is either
+    a knight or a knave, and makes `statements` claims about others,
+    each true exactly when they are a knight, so the puzzle is consistent.
+    """
+    rng = random.Random(seed)
+    knights = [Symbol(f"{i} is a Knight") for i in range(people)]
+    knaves = [Symbol(f"{i} is a Knave") for i in range(people)]
+    roles = [rng.random() < 0.5 for _ in range(people)]
+
+    def claim():
+        """Returns a random claim about a few islanders, and whether it is true."""
+        terms = []
+        for i in rng.sample(range(people), min(people, rng.randint(1, 3))):
+            knight = rng.random() < 0.5
+            terms.append((knights[i] if knight else knaves[i], roles[i] == knight))
+        if rng.random() < 0.5:
+            return And(*[term for term, _ in terms]), all(truth for _, truth in terms)
+        return Or(*[term for term, _ in terms]), any(truth for _, truth in terms)
+
+    knowledge = And()
+    for i in range(people):
+        knowledge.add(Or(knights[i], knaves[i]))
+        knowledge.add(Implication(knights[i], Not(knaves[i])))
+        knowledge.add(Implication(knaves[i], Not(knights[i])))
+        for _ in range(statements):
+            sentence, truth = claim()
+            if truth != roles[i]:
+                sentence = Not(sentence)
+            knowledge.add(Biconditional(knights[i], sentence))
+    return knowledge, knights + knaves
+
+
+def generate_clauses(clauses, symbols, width=3, seed=0):
+    """
+    Returns a knowledge base of `clauses` random disjunctions, each of
+    `width` literals over `symbols` symbols.
+    """
+    rng = random.Random(seed)
+    knowledge = And()
+    for _ in range(clauses):
+        knowledge.add(Or(*[
+            Symbol(f"P{i}") if rng.random() < 0.5 else Not(Symbol(f"P{i}"))
+            for i in rng.sample(range(symbols), width)
+        ]))
+    return knowledge
+
+
+def count_nodes(sentence):
+    """Returns the number of distinct sentence objects in `sentence`."""
+    seen = set()
+    pending = [sentence]
+    while pending:
+        node = pending.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        pending.extend(node.parts())
+    return len(seen)
+
+
+def benchmark_construction(args):
+    """
+    Builds a generated knowledge base, reporting the time taken, the
+    memory it holds, how many distinct sentence objects it is made of,
+    and how long `symbols()` and `hash()` take on it, first and again.
+    """
+    start = time.perf_counter()
+    knowledge = generate_clauses(args.clauses, args.symbols, args.width, args.seed)
+    elapsed = time.perf_counter() - start
+
+    # Tracing slows allocation down, so measure memory on a separate build
+    del knowledge
+    gc.collect()
+    tracemalloc.start()
+    knowledge = generate_clauses(args.clauses, args.symbols, args.width, args.seed)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{args.clauses} clauses of {args.width} literals over {args.symbols} symbols")
+    print(f"{'build seconds':<20} {elapsed:>10.4f}")
+    print(f"{'held KiB':<20} {current / 1024:>10.1f}")
+    print(f"{'peak KiB':<20} {peak / 1024:>10.1f}")
+    print(f"{'distinct nodes':<20} {count_nodes(knowledge):>10,}")
+    for name, operation in (("symbols()", knowledge.symbols), ("hash()", knowledge.__hash__)):
+        for attempt in ("first", "again"):
+            start = time.perf_counter()
+            operation()
+            print(f"{name + ' ' + attempt:<20} {time.perf_counter() - start:>10.6f}")
+
+
+def benchmark_entailment(args):
+    """
+    Compares model checking, one model at a time and compiled over
+    batches of models, with the SAT solver on generated puzzles,
+    querying every symbol. Model checking visits every model, so it is
+    only run up to `--recursive-limit` and `--enumerate-limit` symbols.
+    """
+    print(f"{'symbols':>7} {'engine':<10} {'entailed':>8} {'seconds':>9} {'speedup':>8}")
+    for people in args.sizes:
+        knowledge, symbols = generate_puzzle(people, args.statements, args.seed)
+        engines = {"recursive": model_check_recursive, "enumerate": model_check, "sat": sat.entails}
+        if len(symbols) > args.recursive_limit:
+            del engines["recursive"]
+        if len(symbols) > args.enumerate_limit:
+            del engines["enumerate"]
+
+        baseline = answers = None
+        for name, entails in engines.items():
+            start = time.perf_counter()
+            entailed = [entails(knowledge, symbol) for symbol in symbols]
+            elapsed = time.perf_counter() - start
+            if answers is None:
+                answers = entailed
+                baseline = elapsed
+            elif entailed != answers:
+                raise AssertionError(f"{name} disagrees with {next(iter(engines))} "
+                                     f"on {people} people")
+            speedup = f"{baseline / elapsed:.1f}x" if len(engines) > 1 else "-"
+            print(f"{len(symbols):>7} {name:<10} {sum(entailed):>8} {elapsed:>9.4f} {speedup:>8}")
+
+
+def benchmark_queries(args):
+    """
+    Queries every symbol of generated puzzles, once with a fresh solver
+    per query and once with a knowledge base that keeps its solver, and
+    reports the solver work each needed in total.
+    """
+    print(f"{'symbols':>7} {'solver':<11} {'seconds':>9} {'speedup':>8} "
+          f"{'conflicts':>10} {'decisions':>10} {'propagations':>13}")
+    for people in args.sizes:
+        knowledge, symbols = generate_puzzle(people, args.statements, args.seed)
+
+        # A fresh knowledge base per query is what sat.entails does
+        start = time.perf_counter()
+        fresh = []
+        totals = [0, 0, 0]
+        for symbol in symbols:
+            kb = sat.KnowledgeBase(knowledge)
+            fresh.append(kb.entails(symbol))
+            totals = [total + count for total, count in zip(totals, (
+                kb.solver.conflicts, kb.solver.decisions, kb.solver.propagations))]
+        baseline = time.perf_counter() - start
+        print(f"{len(symbols):>7} {'per query':<11} {baseline:>9.3f} {'1.0x':>8} "
+              f"{totals[0]:>10,} {totals[1]:>10,} {totals[2]:>13,}")
+
+        # Sentences are added one at a time, as a program building a
+        # knowledge base would
+        start = time.perf_counter()
+        kb = sat.KnowledgeBase()
+        for sentence in knowledge.conjuncts:
+            kb.add(sentence)
+        kept = [kb.entails(symbol) for symbol in symbols]
+        elapsed = time.perf_counter() - start
+        if kept != fresh:
+            raise AssertionError(f"kept solver disagrees with fresh solvers on {people} people")
+        print(f"{len(symbols):>7} {'kept':<11} {elapsed:>9.3f} {baseline / elapsed:>7.1f}x "
+              f"{kb.solver.conflicts:>10,} {kb.solver.decisions:>10,} "
+              f"{kb.solver.propagations:>13,}")
+
+
+class Counted(Sentence):
+    """A sentence that counts how many times it is evaluated."""
+
+    def __init__(self, sentence):
+        self.sentence = sentence
+        self.evaluations = 0
+
+    def __hash__(self):
+        return hash(self.sentence)
+
+    def evaluate(self, model):
+        self.evaluations += 1
+        return self.sentence.evaluate(model)
+
+    def parts(self):
+        return (self.sentence,)
+
+
+def benchmark_pruning(args):
+    """
+    Compares the recursion in model_check_recursive with pruned model
+    checking, in one process and split over `--workers` processes,
+    querying every symbol of generated puzzles. Models visited are full
+    models for the recursion and partial models for pruned checking.
+    The recursion is only run up to `--recursive-limit` symbols, and
+    otherwise pruning in one process is the baseline.
+    """
+    print(f"{'symbols':>7} {'engine':<12} {'models visited':>15} {'seconds':>9} {'speedup':>8}")
+    for people in args.sizes:
+        knowledge, symbols = generate_puzzle(people, args.statements, args.seed)
+
+        answers = baseline = None
+        if len(symbols) <= args.recursive_limit:
+            counted = Counted(knowledge)
+            start = time.perf_counter()
+            answers = [model_check_recursive(counted, symbol) for symbol in symbols]
+            baseline = time.perf_counter() - start
+            print(f"{len(symbols):>7} {'recursive':<12} {counted.evaluations:>15,} "
+                  f"{baseline:>9.3f} {'1.0x':>8}")
+
+        for workers in args.workers:
+            visited = 0
+            entailed = []
+            start = time.perf_counter()
+            for symbol in symbols:
+                order = logic.pruning_order(knowledge, symbol)
+                if workers > 1:
+                    answer, count = logic.check_split(knowledge, symbol, order, workers)
+                else:
+                    answer, count = logic.check_partial(knowledge, symbol, order, dict())
+                entailed.append(answer)
+                visited += count
+            elapsed = time.perf_counter() - start
+            if answers is None:
+                answers = entailed
+                baseline = elapsed
+            elif entailed != answers:
+                raise AssertionError(f"pruned x{workers} disagrees on {people} people")
+            engine = f"pruned x{workers}"
+            print(f"{len(symbols):>7} {engine:<12} {visited:>15,} {elapsed:>9.3f} "
+                  f"{baseline / elapsed:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+
+    entailment = benchmarks.add_parser("entailment", help="compare model checking with SAT")
+    entailment.add_argument("--sizes", nargs="+", type=int, default=[4, 8, 10, 12, 50, 100, 250])
+    entailment.add_argument("--statements", type=int, default=2)
+    entailment.add_argument("--recursive-limit", type=int, default=16)
+    entailment.add_argument("--enumerate-limit", type=int, default=24)
+    entailment.add_argument("--seed", type=int, default=0)
+    entailment.set_defaults(run=benchmark_entailment)
+
+    construction = benchmarks.add_parser("construction", help="build a large knowledge base")
+    construction.add_argument("--clauses", type=int, default=10000)
+    construction.add_argument("--symbols", type=int, default=1000)
+    construction.add_argument("--width", type=int, default=3)
+    construction.add_argument("--seed", type=int, default=0)
+    construction.set_defaults(run=benchmark_construction)
+
+    queries = benchmarks.add_parser("queries", help="query every symbol of a knowledge base")
+    queries.add_argument("--sizes", nargs="+", type=int, default=[50, 250, 500])
+    queries.add_argument("--statements", type=int, default=2)
+    queries.add_argument("--seed", type=int, default=0)
+    queries.set_defaults(run=benchmark_queries)
+
+    pruning = benchmarks.add_parser("pruning", help="compare pruned model checking with recursion")
+    pruning.add_argument("--sizes", nargs="+", type=int, default=[4, 6, 8, 15])
+    pruning.add_argument("--recursive-limit", type=int, default=16)
+    pruning.add_argument("--statements", type=int, default=2)
+    pruning.add_argument("--workers", nargs="+", type=int, default=[1, 4])
+    pruning.add_argument("--seed", type=int, default=0)
+    pruning.set_defaults(run=benchmark_pruning)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
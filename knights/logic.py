@@ -1,25 +1,95 @@
+import functools
 import itertools
+import math
+import multiprocessing
+import operator
+import weakref
 
 
 class Sentence():
+    """
+    Sentences are hash-consed, unless they contain an And: building a
+    sentence equal to one that already exists returns the existing object,
+    so identical subformulas are shared. Every sentence caches its hash,
+    and its set of symbols once asked for it, and should not be changed
+    once it is part of another sentence.
+    """
+
+    __slots__ = ("_hash", "_symbols", "_shared", "__weakref__")
+
+    # Shared sentences of each class by their parts, each dropped once
+    # nothing else uses it
+    interned = {}
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave symbols
+        out, returning None if its value depends on those symbols.
+
+        Subclasses that only know `evaluate` get a value once all their
+        symbols are in the model.
+        """
+        if not self.symbol_set() <= model.keys():
+            return None
+        return bool(self.evaluate(model))
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.symbol_set())
+
+    def symbol_set(self):
+        """Returns the cached set of symbols in the sentence, not to be changed."""
+        # Subclasses written without caching in mind need not set `_symbols`,
+        # and may only say what their symbols are by overriding `symbols`
+        if getattr(self, "_symbols", None) is None:
+            if type(self).symbols is not Sentence.symbols:
+                self._symbols = frozenset(self.symbols())
+            else:
+                self._symbols = frozenset().union(*[part.symbol_set() for part in self.parts()])
+        return self._symbols
+
+    def parts(self):
+        """Returns the sentences that this sentence is made of."""
+        return ()
 
     @classmethod
     def validate(cls, sentence):
         if not isinstance(sentence, Sentence):
             raise TypeError("must be a logical sentence")
 
+    @classmethod
+    def share(cls, key, parts, build):
+        """
+        Returns the shared sentence of this class made of `parts`, found
+        by `key`, first calling `build` to make it if there is none.
+
+        A conjunction can be changed by `add`, so a sentence with one
+        among its parts, however deep, is built afresh and not shared,
+        as is one with a part of a subclass that does not say it is shared.
+        """
+        if not all(getattr(part, "_shared", False) for part in parts):
+            sentence = build()
+            sentence._shared = False
+            return sentence
+
+        interned = Sentence.interned.get(cls)
+        if interned is None:
+            interned = Sentence.interned[cls] = weakref.WeakValueDictionary()
+        sentence = interned.get(key)
+        if sentence is None:
+            sentence = build()
+            sentence._shared = True
+            interned[key] = sentence
+        return sentence
+
     @classmethod
     def parenthesize(cls, s):
         """Parenthesizes an expression if not already parenthesized."""
@@ -44,14 +114,25 @@ class Sentence():
 
 class Symbol(Sentence):
 
-    def __init__(self, name):
-        self.name = name
+    __slots__ = ("name",)
+
+    def __new__(cls, name):
+        def build():
+            sentence = object.__new__(cls)
+            sentence.name = name
+            sentence._hash = hash(("symbol", name))
+            sentence._symbols = frozenset([name])
+            return sentence
+        return cls.share(name, (), build)
+
+    def __reduce__(self):
+        return (type(self), (self.name,))
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (isinstance(other, Symbol) and self.name == other.name)
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        return self._hash
 
     def __repr__(self):
         return self.name
@@ -62,23 +143,39 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
-
 
 class Not(Sentence):
-    def __init__(self, operand):
+
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
         Sentence.validate(operand)
-        self.operand = operand
+
+        def build():
+            sentence = object.__new__(cls)
+            sentence.operand = operand
+            sentence._hash = hash(("not", hash(operand)))
+            sentence._symbols = None
+            return sentence
+        return cls.share(operand, (operand,), build)
+
+    def __reduce__(self):
+        return (type(self), (self.operand,))
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (isinstance(other, Not)
+                                 and self._hash == other._hash
+                                 and self.operand == other.operand)
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        return self._hash
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,26 +183,46 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def parts(self):
+        return (self.operand,)
 
 
 class And(Sentence):
+    """
+    A conjunction, which unlike other sentences is never shared, since
+    `add` changes it. Its hash is worked out again after an `add`, and
+    its symbols, once asked for, are kept up to date as conjuncts are added.
+    """
+
+    __slots__ = ("conjuncts",)
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
+        self._hash = None
+        self._symbols = None
+        self._shared = False
+
+    def __reduce__(self):
+        return (type(self), tuple(self.conjuncts))
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (isinstance(other, And) and self.conjuncts == other.conjuncts)
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        if self._hash is None:
+            self._hash = hash(
+                ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+            )
+        return self._hash
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +231,73 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        """
+        Adds a conjunct. A conjunction should not be added to once it is
+        part of another sentence, which keeps its old hash and symbols.
+        """
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
+        self._hash = None
+        if self._symbols is not None:
+            self._symbols |= conjunct.symbol_set()
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def parts(self):
+        return self.conjuncts
+
+    def symbol_set(self):
+        # A set rather than a frozenset, so that `add` can update it in place
+        if self._symbols is None:
+            self._symbols = set().union(*[conjunct.symbol_set() for conjunct in self.conjuncts])
+        return self._symbols
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+
+        def build():
+            sentence = object.__new__(cls)
+            sentence.disjuncts = list(disjuncts)
+            sentence._hash = hash(
+                ("or", tuple(hash(disjunct) for disjunct in disjuncts))
+            )
+            sentence._symbols = None
+            return sentence
+        return cls.share(disjuncts, disjuncts, build)
+
+    def __reduce__(self):
+        return (type(self), tuple(self.disjuncts))
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (isinstance(other, Or)
+                                 and self._hash == other._hash
+                                 and self.disjuncts == other.disjuncts)
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        return self._hash
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,30 +306,54 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def parts(self):
+        return self.disjuncts
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+
+        def build():
+            sentence = object.__new__(cls)
+            sentence.antecedent = antecedent
+            sentence.consequent = consequent
+            sentence._hash = hash(("implies", hash(antecedent), hash(consequent)))
+            sentence._symbols = None
+            return sentence
+        return cls.share((antecedent, consequent), (antecedent, consequent), build)
+
+    def __reduce__(self):
+        return (type(self), (self.antecedent, self.consequent))
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (isinstance(other, Implication)
+                                 and self._hash == other._hash
+                                 and self.antecedent == other.antecedent
+                                 and self.consequent == other.consequent)
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return self._hash
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,50 +362,243 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def parts(self):
+        return (self.antecedent, self.consequent)
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+
+        def build():
+            sentence = object.__new__(cls)
+            sentence.left = left
+            sentence.right = right
+            sentence._hash = hash(("biconditional", hash(left), hash(right)))
+            sentence._symbols = None
+            return sentence
+        return cls.share((left, right), (left, right), build)
+
+    def __reduce__(self):
+        return (type(self), (self.left, self.right))
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (isinstance(other, Biconditional)
+                                 and self._hash == other._hash
+                                 and self.left == other.left
+                                 and self.right == other.right)
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return self._hash
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
 
     def evaluate(self, model):
-        return ((self.left.evaluate(model)
-                 and self.right.evaluate(model))
-                or (not self.left.evaluate(model)
-                    and not self.right.evaluate(model)))
+        return self.left.evaluate(model) == self.right.evaluate(model)
+
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
 
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def parts(self):
+        return (self.left, self.right)
+
+
+class Evaluator():
+    """
+    A sentence compiled to a flat program over bit-packed models.
+
+    Models are packed into one integer per symbol, in the order of
+    `symbols`: bit k of a symbol's integer is its value in model k.
+    Every step of the program combines whole integers, so one run
+    evaluates the sentence in every model of the batch.
+    """
+
+    def __init__(self, sentence, symbols=None):
+        if symbols is None:
+            symbols = sorted(sentence.symbol_set())
+        self.symbols = list(symbols)
+        self.positions = {name: i for i, name in enumerate(self.symbols)}
+
+        # Registers 0 to n - 1 hold the symbols, and each step of the
+        # program computes the next register from earlier ones
+        self.program = []
+        self.result = self.emit(sentence, {})
+
+    def emit(self, sentence, registers):
+        """
+        Adds the steps that compute `sentence` to the program, and returns
+        the register holding its value. Subsentences shared within the
+        tree, found in `registers` by identity, are only computed once.
+        """
+        if isinstance(sentence, Symbol):
+            try:
+                return self.positions[sentence.name]
+            except KeyError:
+                raise Exception(f"variable {sentence.name} not in model")
+        if id(sentence) in registers:
+            return registers[id(sentence)][0]
+
+        if isinstance(sentence, Not):
+            step = (Evaluator.negate, self.emit(sentence.operand, registers))
+        elif isinstance(sentence, And):
+            step = (Evaluator.conjoin,) + tuple(self.emit(conjunct, registers)
+                                                for conjunct in sentence.conjuncts)
+        elif isinstance(sentence, Or):
+            step = (Evaluator.disjoin,) + tuple(self.emit(disjunct, registers)
+                                                for disjunct in sentence.disjuncts)
+        elif isinstance(sentence, Implication):
+            step = (Evaluator.implies, self.emit(sentence.antecedent, registers),
+                    self.emit(sentence.consequent, registers))
+        elif isinstance(sentence, Biconditional):
+            step = (Evaluator.iff, self.emit(sentence.left, registers),
+                    self.emit(sentence.right, registers))
+        else:
+            # Sentences of other classes are evaluated one model at a time
+            step = (functools.partial(Evaluator.each_model, sentence, self.symbols),
+                    *range(len(self.symbols)))
+
+        self.program.append(step)
+        register = len(self.symbols) + len(self.program) - 1
+
+        # Keep the sentence alive so that its id is not reused
+        registers[id(sentence)] = (register, sentence)
+        return register
+
+    @staticmethod
+    def each_model(sentence, symbols, mask, *columns):
+        result = 0
+        for k in range(mask.bit_length()):
+            model = {name: bool(column >> k & 1) for name, column in zip(symbols, columns)}
+            if sentence.evaluate(model):
+                result |= 1 << k
+        return result
+
+    @staticmethod
+    def negate(mask, a):
+        return mask ^ a
+
+    @staticmethod
+    def conjoin(mask, *operands):
+        return functools.reduce(operator.and_, operands, mask)
+
+    @staticmethod
+    def disjoin(mask, *operands):
+        return functools.reduce(operator.or_, operands, 0)
+
+    @staticmethod
+    def implies(mask, a, b):
+        return (mask ^ a) | b
+
+    @staticmethod
+    def iff(mask, a, b):
+        return mask ^ a ^ b
+
+    def evaluate(self, columns, size):
+        """
+        Evaluates the sentence in a batch of `size` models, given the
+        integer of each symbol. Returns an integer whose bit k is the
+        sentence's value in model k.
+        """
+        mask = (1 << size) - 1
+        registers = list(columns)
+        for operation, *operands in self.program:
+            registers.append(operation(mask, *[registers[i] for i in operands]))
+        return registers[self.result]
+
+    def pack(self, models):
+        """Returns the integer of each symbol for a list of models."""
+        columns = [0] * len(self.symbols)
+        for k, model in enumerate(models):
+            for i, name in enumerate(self.symbols):
+                try:
+                    value = model[name]
+                except KeyError:
+                    raise Exception(f"variable {name} not in model")
+                if value:
+                    columns[i] |= 1 << k
+        return columns
+
+
+@functools.lru_cache(maxsize=None)
+def all_models(count):
+    """
+    Returns the integers of `count` symbols in a batch of all 2 ** count
+    models, where model k gives symbol i the value of bit i of k.
+    """
+    size = 1 << count
+    columns = []
+    for i in range(count):
+        # Runs of 2 ** i false then 2 ** i true, doubled to fill the batch
+        half = 1 << i
+        column = ((1 << half) - 1) << half
+        width = 2 * half
+        while width < size:
+            column |= column << width
+            width *= 2
+        columns.append(column)
+    return tuple(columns)
+
+
+# Symbols enumerated within one batch of models by model_check
+BATCH_SYMBOLS = 16
 
 
 def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    """
+    Checks if knowledge base entails query.
+
+    The implication from knowledge to query is compiled and evaluated
+    in batches of up to 2 ** BATCH_SYMBOLS models at a time: the first
+    symbols vary within a batch, and the rest are fixed per batch.
+    """
+    symbols = sorted(knowledge.symbol_set() | query.symbol_set())
+    evaluator = Evaluator(Implication(knowledge, query), symbols)
+
+    inner = min(len(symbols), BATCH_SYMBOLS)
+    size = 1 << inner
+    mask = (1 << size) - 1
+    columns = list(all_models(inner))
+    for outer in range(1 << (len(symbols) - inner)):
+        fixed = [mask if outer >> i & 1 else 0 for i in range(len(symbols) - inner)]
+        if evaluator.evaluate(columns + fixed, size) != mask:
+            return False
+    return True
+
+
+def model_check_recursive(knowledge, query):
+    """Checks if knowledge base entails query, one model at a time."""
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
@@ -261,3 +633,91 @@ def model_check(knowledge, query):
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+def check_partial(knowledge, query, symbols, model):
+    """
+    Checks if knowledge base entails query in every completion of the
+    partial `model` that assigns the remaining `symbols`, in order.
+
+    Branches are cut as soon as the partial model makes knowledge false,
+    or makes query true, or makes knowledge true and query false.
+    Returns the answer and the number of partial models visited.
+    """
+    visited = 1
+    known = knowledge.evaluate_partial(model)
+    if known is False:
+        return True, visited
+    answer = query.evaluate_partial(model)
+    if answer is True:
+        return True, visited
+    if answer is False and known is True:
+        return False, visited
+    if not symbols:
+        raise Exception("model assigns every symbol but a sentence is undetermined")
+
+    # Assign the next symbol each way, in place rather than copying the model
+    p = symbols[0]
+    try:
+        for value in (True, False):
+            model[p] = value
+            entailed, count = check_partial(knowledge, query, symbols[1:], model)
+            visited += count
+            if not entailed:
+                return False, visited
+    finally:
+        del model[p]
+    return True, visited
+
+
+def check_branch(task):
+    """Runs `check_partial` on one branch of a split, in a worker process."""
+    return check_partial(*task)
+
+
+def check_split(knowledge, query, symbols, workers, branches=None):
+    """
+    Checks if knowledge base entails query by assigning the first
+    symbols every possible way, and checking each of the resulting
+    `branches` partial models in a pool of `workers` processes.
+    Returns the answer and the number of partial models visited.
+    """
+    if branches is None:
+        branches = 4 * workers
+    depth = min(len(symbols), math.ceil(math.log2(max(branches, 1))))
+    split, rest = symbols[:depth], symbols[depth:]
+    tasks = [
+        (knowledge, query, rest, dict(zip(split, values)))
+        for values in itertools.product((True, False), repeat=depth)
+    ]
+
+    visited = 0
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        # Leaving the pool stops the other branches once one fails
+        for entailed, count in pool.imap_unordered(check_branch, tasks):
+            visited += count
+            if not entailed:
+                return False, visited
+    return True, visited
+
+
+def pruning_order(knowledge, query):
+    """
+    Returns the symbols to assign when checking entailment by pruning:
+    the query's first, since they decide it, then the knowledge base's.
+    """
+    return sorted(query.symbol_set()) + sorted(knowledge.symbol_set() - query.symbol_set())
+
+
+def model_check_pruned(knowledge, query, workers=1):
+    """
+    Checks if knowledge base entails query, enumerating partial models
+    and cutting branches whose answer is already determined. The query's
+    symbols are assigned first, and with more than one worker the first
+    few symbols split the models between processes.
+    """
+    symbols = pruning_order(knowledge, query)
+    if workers > 1:
+        return check_split(knowledge, query, symbols, workers)[0]
+    return check_partial(knowledge, query, symbols, dict())[0]
@@ -1,4 +1,8 @@
+import argparse
+import functools
+
 from logic import *
+from sat import KnowledgeBase
 
 AKnight = Symbol("A is a Knight")
 AKnave = Symbol("A is a Knave")
@@ -77,7 +81,21 @@ knowledge3 = And(
 )
 
 
+# Ways to check entailment, each given the knowledge to return a check for a query
+ENGINES = {
+    "enumerate": lambda knowledge: functools.partial(model_check, knowledge),
+    "pruned": lambda knowledge: functools.partial(model_check_pruned, knowledge),
+    "sat": lambda knowledge: KnowledgeBase(knowledge).entails,
+}
+
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engine", choices=list(ENGINES), default="enumerate",
+                        help="check entailment by enumerating all models, by enumerating "
+                             "partial models and pruning, or with a SAT solver")
+    engine = ENGINES[parser.parse_args().engine]
+
     symbols = [AKnight, AKnave, BKnight, BKnave, CKnight, CKnave]
     puzzles = [
         ("Puzzle 0", knowledge0),
@@ -90,8 +108,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            check = engine(knowledge)
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if check(symbol):
                     print(f"    {symbol}")
 
 
@@ -0,0 +1,427 @@
+import heapq
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+class CNF():
+    """
+    Tseitin encoding of logical sentences into clauses over integer
+    variables: every symbol, and every compound subsentence, gets a
+    variable, and literal `v` or `-v` says it is true or false.
+    """
+
+    def __init__(self):
+        self.variables = {}
+        self.clauses = []
+        self.count = 0
+
+        # Literal already given to each compound subsentence, by identity
+        self.encoded = {}
+
+        # Variable that is always true, for empty conjunctions and disjunctions
+        self.true = self.new_variable()
+        self.clauses.append([self.true])
+
+    def new_variable(self):
+        """Returns a fresh variable."""
+        self.count += 1
+        return self.count
+
+    def symbol(self, name):
+        """Returns the variable of the symbol called `name`."""
+        if name not in self.variables:
+            self.variables[name] = self.new_variable()
+        return self.variables[name]
+
+    def literal(self, sentence):
+        """
+        Returns a literal that is true exactly when `sentence` is,
+        adding the clauses that define any new variables it needs.
+        """
+        if isinstance(sentence, Symbol):
+            return self.symbol(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+
+        key = id(sentence)
+        if key in self.encoded:
+            return self.encoded[key][0]
+
+        if isinstance(sentence, And):
+            literals = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            if not literals:
+                return self.true
+            x = self.new_variable()
+            self.clauses += [[-x, literal] for literal in literals]
+            self.clauses.append([x] + [-literal for literal in literals])
+        elif isinstance(sentence, Or):
+            literals = [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            if not literals:
+                return -self.true
+            x = self.new_variable()
+            self.clauses += [[x, -literal] for literal in literals]
+            self.clauses.append([-x] + literals)
+        elif isinstance(sentence, Implication):
+            a = self.literal(sentence.antecedent)
+            b = self.literal(sentence.consequent)
+            x = self.new_variable()
+            self.clauses += [[-x, -a, b], [x, a], [x, -b]]
+        elif isinstance(sentence, Biconditional):
+            a = self.literal(sentence.left)
+            b = self.literal(sentence.right)
+            x = self.new_variable()
+            self.clauses += [[-x, -a, b], [-x, a, -b], [x, a, b], [x, -a, -b]]
+        else:
+            raise TypeError(f"cannot encode {type(sentence).__name__}")
+
+        # Keep the sentence alive so that its id is not reused
+        self.encoded[key] = (x, sentence)
+        return x
+
+    def add(self, sentence):
+        """
+        Adds clauses asserting `sentence`. Top-level conjunctions and
+        disjunctions are asserted directly, without a variable of their own.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append([self.literal(disjunct) for disjunct in sentence.disjuncts])
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+
+def luby(i):
+    """Returns the `i`th term (from 1) of the Luby restart sequence."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+class Solver():
+    """
+    Conflict-driven clause learning SAT solver over the integer
+    literals of a CNF, with two watched literals per clause.
+
+    Internally literal `v` is coded as 2v and `-v` as 2v + 1, so that
+    negation flips the lowest bit and codes index flat lists.
+    """
+
+    # Conflicts before the first restart, scaled by the Luby sequence
+    RESTART_BASE = 100
+
+    def __init__(self, count=0):
+        self.count = 0
+        self.values = [0, 0]          # by literal code: 1 true, -1 false, 0 unassigned
+        self.level = [0]              # by variable
+        self.reason = [None]          # by variable: clause that implied it
+        self.activity = [0.0]         # by variable
+        self.phase = [False]          # by variable: last value, reused when deciding
+        self.watches = [[], []]       # by literal code: clauses watching it
+        self.clauses = []
+        self.trail = []
+        self.trail_limits = []
+        self.propagated = 0
+        self.order = []
+        self.increment = 1.0
+        self.inconsistent = False
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+        self.ensure(count)
+
+    def ensure(self, count):
+        """Makes room for variables up to `count`."""
+        while self.count < count:
+            self.count += 1
+            self.values += [0, 0]
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+            self.watches += [[], []]
+            heapq.heappush(self.order, (0.0, self.count))
+
+    @staticmethod
+    def code(literal):
+        return 2 * literal if literal > 0 else -2 * literal + 1
+
+    @staticmethod
+    def literal(code):
+        return code >> 1 if not code & 1 else -(code >> 1)
+
+    def add_clause(self, literals):
+        """
+        Adds a clause of integer literals. Must be called between
+        searches, when only facts of level 0 are assigned. Returns
+        False if the clauses have become unsatisfiable.
+        """
+        if self.inconsistent:
+            return False
+        codes = {2 * literal if literal > 0 else -2 * literal + 1 for literal in literals}
+        if codes and max(codes) >> 1 > self.count:
+            self.ensure(max(codes) >> 1)
+
+        clause = []
+        values = self.values
+        for code in codes:
+            if values[code] == 1 or code ^ 1 in codes:
+                return True
+            if values[code] == 0:
+                clause.append(code)
+
+        if not clause:
+            self.inconsistent = True
+            return False
+        if len(clause) == 1:
+            self.assign(clause[0], None)
+            if self.propagate() is not None:
+                self.inconsistent = True
+                return False
+            return True
+        self.attach(clause)
+        return True
+
+    def attach(self, clause):
+        """Stores `clause`, watching its first two literals."""
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def assign(self, code, reason):
+        variable = code >> 1
+        self.values[code] = 1
+        self.values[code ^ 1] = -1
+        self.level[variable] = len(self.trail_limits)
+        self.reason[variable] = reason
+        self.trail.append(code)
+
+    def propagate(self):
+        """
+        Assigns every literal forced by unit clauses. Returns the
+        clause that became false, if any, otherwise None.
+        """
+        values = self.values
+        while self.propagated < len(self.trail):
+            false = self.trail[self.propagated] ^ 1
+            self.propagated += 1
+            self.propagations += 1
+            watching = self.watches[false]
+            kept = []
+            i = 0
+            while i < len(watching):
+                clause = watching[i]
+                i += 1
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], false
+                if values[clause[0]] == 1:
+                    kept.append(clause)
+                    continue
+
+                # Look for another literal that is not false to watch instead
+                for k in range(2, len(clause)):
+                    if values[clause[k]] != -1:
+                        clause[1], clause[k] = clause[k], false
+                        self.watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if values[clause[0]] == -1:
+                        kept += watching[i:]
+                        self.watches[false] = kept
+                        self.propagated = len(self.trail)
+                        return clause
+                    self.assign(clause[0], clause)
+            self.watches[false] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the clause learned from `conflict` by resolving back to
+        the first unique implication point, with the literal it asserts
+        first, and the level to jump back to.
+        """
+        seen = set()
+        learned = [None]
+        pending = 0
+        code = None
+        index = len(self.trail) - 1
+        current = len(self.trail_limits)
+        clause = conflict
+        while True:
+            for other in clause:
+                if other == code:
+                    continue
+                variable = other >> 1
+                if variable in seen or self.level[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump(variable)
+                if self.level[variable] == current:
+                    pending += 1
+                else:
+                    learned.append(other)
+
+            # Walk back to the next literal of this level that was involved
+            while (self.trail[index] >> 1) not in seen:
+                index -= 1
+            code = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reason[code >> 1]
+
+        learned[0] = code ^ 1
+        if len(learned) == 1:
+            return learned, 0
+
+        # Watch the literal of the highest remaining level second
+        highest = max(range(1, len(learned)), key=lambda k: self.level[learned[k] >> 1])
+        learned[1], learned[highest] = learned[highest], learned[1]
+        return learned, self.level[learned[1] >> 1]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        heapq.heappush(self.order, (-self.activity[variable], variable))
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.order = [(-self.activity[v], v) for v in range(1, self.count + 1)]
+            heapq.heapify(self.order)
+
+    def backtrack(self, level):
+        """Undoes every assignment above decision level `level`."""
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        for code in reversed(self.trail[start:]):
+            variable = code >> 1
+            self.values[code] = self.values[code ^ 1] = 0
+            self.reason[variable] = None
+            self.phase[variable] = not code & 1
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.propagated = start
+
+    def pick(self):
+        """Returns the unassigned variable of highest activity, or None."""
+        while self.order:
+            _, variable = heapq.heappop(self.order)
+            if self.values[2 * variable] == 0:
+                return variable
+        for variable in range(1, self.count + 1):
+            if self.values[2 * variable] == 0:
+                return variable
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses can all be true together with the
+        literals in `assumptions`, otherwise False. Learned clauses are
+        kept for later calls, whatever the assumptions.
+        """
+        if self.inconsistent:
+            return False
+        self.ensure(max((abs(literal) for literal in assumptions), default=0))
+        assumptions = [self.code(literal) for literal in assumptions]
+        restarts = 0
+        budget = self.RESTART_BASE * luby(1)
+        try:
+            while True:
+                conflict = self.propagate()
+                if conflict is not None:
+                    self.conflicts += 1
+                    budget -= 1
+                    if not self.trail_limits:
+                        self.inconsistent = True
+                        return False
+                    learned, level = self.analyze(conflict)
+                    self.backtrack(level)
+                    if len(learned) == 1:
+                        self.assign(learned[0], None)
+                    else:
+                        self.attach(learned)
+                        self.assign(learned[0], learned)
+                    self.increment *= 1.05
+                    continue
+
+                if budget <= 0:
+                    restarts += 1
+                    budget = self.RESTART_BASE * luby(restarts + 1)
+                    self.backtrack(0)
+                    continue
+
+                # Assumptions are the first decisions, in order
+                level = len(self.trail_limits)
+                if level < len(assumptions):
+                    code = assumptions[level]
+                    if self.values[code] == -1:
+                        return False
+                    self.trail_limits.append(len(self.trail))
+                    if self.values[code] == 0:
+                        self.assign(code, None)
+                    continue
+
+                variable = self.pick()
+                if variable is None:
+                    return True
+                self.decisions += 1
+                self.trail_limits.append(len(self.trail))
+                self.assign(2 * variable + (not self.phase[variable]), None)
+        finally:
+            self.model = [self.values[2 * v] == 1 for v in range(self.count + 1)]
+            self.backtrack(0)
+
+
+class KnowledgeBase():
+    """
+    Sentences asserted into one solver that is kept between queries, so
+    that clauses learned and facts propagated while answering one query
+    are reused by the next.
+    """
+
+    def __init__(self, *sentences):
+        self.cnf = CNF()
+        self.solver = Solver()
+        for sentence in sentences:
+            self.add(sentence)
+
+    def flush(self):
+        """Passes the clauses encoded since the last flush to the solver."""
+        for clause in self.cnf.clauses:
+            self.solver.add_clause(clause)
+        self.cnf.clauses.clear()
+
+    def add(self, sentence):
+        """Asserts `sentence`, adding only its clauses to the solver."""
+        self.cnf.add(sentence)
+        self.flush()
+
+    def entails(self, query):
+        """
+        Checks if the knowledge base entails query, by solving under the
+        assumption that query is false rather than asserting it, so that
+        the knowledge base itself is left unchanged.
+        """
+        # Clauses defining the query's variables only name new variables,
+        # so they can stay once the query is answered
+        goal = self.cnf.literal(query)
+        self.flush()
+        return not self.solver.solve([-goal])
+
+
+def entails(knowledge, query):
+    """
+    Checks if knowledge base entails query, like `logic.model_check`,
+    by showing that knowledge and the negation of query are unsatisfiable.
+    """
+    return KnowledgeBase(knowledge).entails(query)
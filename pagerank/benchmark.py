@@ -0,0 +1,339 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pagerank
+import numpy
+
+from crawler import crawl_edges
+from graph import LinkGraph
+from incremental import TOLERANCE, PageRankState
+from sampling import sample_ranks
+from solvers import SOLVERS, IterationLog, step
+
+
+def synthetic_corpus(pages, links, seed=0):
+    """
+    Returns a corpus of `pages` pages, each linking to up to
+    `links` other pages chosen at random.
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+    return {
+        name: set(rng.sample(names, min(links, pages))) - {name}
+        for name in names
+    }
+
+
+def web_corpus(pages, links, seed=0):
+    """
+    Returns a corpus of `pages` pages shaped more like the web than
+    `synthetic_corpus`: most links go to nearby pages, and the rest
+    favour a small number of popular pages.
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+    corpus = dict()
+    for i, name in enumerate(names):
+        linked = set()
+        for _ in range(links):
+            if rng.random() < 0.8:
+                linked.add(names[(i + rng.randint(-50, 50)) % pages])
+            else:
+                linked.add(names[int(pages * rng.random() ** 4)])
+        corpus[name] = linked - {name}
+    return corpus
+
+
+def corpora(args, generate=synthetic_corpus):
+    """
+    Yields (name, corpus) for every corpus named on the command line,
+    then for every size of corpus to `generate`.
+    """
+    for name in args.corpora:
+        yield name, pagerank.crawl(name)
+    for size in args.synthetic:
+        yield f"synthetic-{size}", generate(size, args.links, args.seed)
+
+
+def transition_model_sampler(corpus, damping_factor, n):
+    """
+    Samples `n` pages one at a time by calling `transition_model` on every
+    step, as `sample_pagerank` used to. Kept as the baseline to compare against.
+    """
+    pages = list(corpus)
+    counts = dict.fromkeys(pages, 0)
+    page = random.choice(pages)
+    counts[page] += 1
+    for _ in range(1, n):
+        distribution = pagerank.transition_model(corpus, page, damping_factor)
+        page = random.choices(list(distribution), weights=list(distribution.values()))[0]
+        counts[page] += 1
+    return {page: count / n for page, count in counts.items()}
+
+
+def benchmark_sampling(args):
+    """
+    Compares samples per second of the per-step transition model
+    sampler with vectorized surfers.
+    """
+    print(f"{'corpus':<18} {'sampler':<22} {'samples/sec':>14}")
+    for name, corpus in corpora(args):
+        start = time.perf_counter()
+        transition_model_sampler(corpus, pagerank.DAMPING, args.baseline_samples)
+        rate = args.baseline_samples / (time.perf_counter() - start)
+        print(f"{name:<18} {'transition_model':<22} {rate:>14,.0f}")
+
+        graph = LinkGraph.from_corpus(corpus)
+        for surfers in args.surfers:
+            start = time.perf_counter()
+            sample_ranks(graph, pagerank.DAMPING, args.samples, surfers, seed=args.seed)
+            rate = args.samples / (time.perf_counter() - start)
+            print(f"{name:<18} {f'{surfers} surfers':<22} {rate:>14,.0f}")
+
+
+def write_corpus(directory, corpus):
+    """Writes each page of `corpus` to `directory` as an HTML file."""
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write("<!DOCTYPE html>\n<html>\n<body>\n")
+            for link in links:
+                f.write(f'<p>See <a href="{link}">{link}</a>.</p>\n')
+            f.write("</body>\n</html>\n")
+
+
+def benchmark_crawl(args):
+    """
+    Measures crawl throughput in files per second on a synthetic corpus
+    written to disk, for `crawl` and for the pooled crawler.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        corpus_directory = os.path.join(directory, "corpus")
+        os.mkdir(corpus_directory)
+        write_corpus(corpus_directory, synthetic_corpus(args.pages, args.links, args.seed))
+        output = os.path.join(directory, "edges")
+
+        print(f"{'crawler':<12} {'workers':>8} {'files/sec':>12}")
+        start = time.perf_counter()
+        pagerank.crawl(corpus_directory)
+        rate = args.pages / (time.perf_counter() - start)
+        print(f"{'crawl':<12} {1:>8} {rate:>12,.0f}")
+
+        for executor in ("thread", "process"):
+            for workers in args.workers:
+                start = time.perf_counter()
+                crawl_edges(corpus_directory, output, workers, executor)
+                rate = args.pages / (time.perf_counter() - start)
+                print(f"{executor:<12} {workers:>8} {rate:>12,.0f}")
+
+
+def iterate_to_tolerance(graph, ranks, damping_factor, tolerance):
+    """
+    Runs power iteration from `ranks` until the 1-norm of the change is
+    at most `tolerance`, returning the number of iterations taken.
+    """
+    iterations = 0
+    while True:
+        new_ranks = step(graph, ranks, damping_factor)
+        iterations += 1
+        if numpy.abs(new_ranks - ranks).sum() <= tolerance:
+            return iterations
+        ranks = new_ranks
+
+
+def push(graph, ranks, damping_factor, tolerance=TOLERANCE, max_rounds=10000):
+    """
+    Refines `ranks` towards the PageRank vector of `graph` by pushing
+    residual rank along links, only from pages whose residual is large.
+
+    The residual of page `i` is how far its rank is from what one step of
+    the surfer would give it. Every round, each page whose residual is at
+    least the average takes it into its rank and passes `damping_factor`
+    of it on along its links (or to every page, if it has none). Stops once
+    the 1-norm of the residual, the same measure power iteration uses with
+    `norm=1`, is at most `tolerance`.
+
+    Returns the refined ranks and a dictionary counting the rounds taken,
+    the pages pushed from and the links walked.
+
+    Every round still scans all n residuals, so on large graphs this is
+    slower than warm-started power iteration, which PageRankState.update
+    uses instead. It is kept here only to be compared with it.
+    """
+    n = len(graph)
+    offsets, links = graph.out_links()
+    ranks = ranks.copy()
+    residual = step(graph, ranks, damping_factor) - ranks
+    stats = {"rounds": 0, "pushes": 0, "links": 0}
+
+    while stats["rounds"] < max_rounds:
+        total = numpy.abs(residual).sum()
+        if total <= tolerance:
+            break
+
+        # Some page is always at least average, so every round makes progress
+        active = numpy.flatnonzero(numpy.abs(residual) >= total / n)
+        mass = residual[active]
+        ranks[active] += mass
+        residual[active] = 0
+
+        # Rank on dangling pages is spread evenly over every page
+        dangling = graph.dangling[active]
+        residual += damping_factor * mass[dangling].sum() / n
+
+        # Everything else flows along the links out of its page
+        linked = active[~dangling]
+        degrees = graph.out_degree[linked]
+        firsts = numpy.cumsum(degrees) - degrees
+        positions = numpy.arange(degrees.sum()) + numpy.repeat(offsets[linked] - firsts, degrees)
+        shares = numpy.repeat(damping_factor * mass[~dangling] / degrees, degrees)
+        residual += numpy.bincount(links[positions], weights=shares, minlength=n)
+
+        stats["rounds"] += 1
+        stats["pushes"] += len(active)
+        stats["links"] += len(positions)
+
+    return ranks, stats
+
+
+def benchmark_incremental(args):
+    """
+    Compares recomputing ranks from scratch after a small change to the
+    corpus with warm-started power iteration, which PageRankState.update
+    uses, and residual pushing.
+    """
+    rng = random.Random(args.seed)
+    corpus = web_corpus(args.pages, args.links, args.seed)
+
+    # Solve well past the tolerance, so that only the change needs correcting
+    state = PageRankState.solve(LinkGraph.from_corpus(corpus), pagerank.DAMPING,
+                                args.tolerance / 1000)
+
+    # Rewrite the links of a few pages, in the same style as the corpus
+    changed = web_corpus(args.pages, args.links, args.seed + 1)
+    changed = {page: changed[page] for page in rng.sample(list(corpus), args.changes)}
+    graph, ranks = state.apply(changed)
+    links = len(graph.sources)
+
+    print(f"{args.changes} of {args.pages} pages changed, tolerance {args.tolerance}")
+    print(f"{'method':<18} {'iterations':>10} {'links walked':>14} {'seconds':>10}")
+
+    start = time.perf_counter()
+    iterations = iterate_to_tolerance(graph, numpy.full(len(graph), 1 / len(graph)),
+                                      pagerank.DAMPING, args.tolerance)
+    elapsed = time.perf_counter() - start
+    print(f"{'power (uniform)':<18} {iterations:>10} {iterations * links:>14,} {elapsed:>10.3f}")
+
+    start = time.perf_counter()
+    iterations = iterate_to_tolerance(graph, ranks, pagerank.DAMPING, args.tolerance)
+    elapsed = time.perf_counter() - start
+    print(f"{'power (warm)':<18} {iterations:>10} {iterations * links:>14,} {elapsed:>10.3f}")
+
+    start = time.perf_counter()
+    _, stats = push(graph, ranks, pagerank.DAMPING, args.tolerance)
+    elapsed = time.perf_counter() - start
+    print(f"{'push (warm)':<18} {stats['rounds']:>10} {stats['links']:>14,} {elapsed:>10.3f}")
+
+
+def benchmark_solvers(args):
+    """
+    Compares iterations to tolerance and wall time of every solver.
+    """
+    print(f"{'corpus':<18} {'solver':<15} {'iterations':>10} {'seconds':>10} {'final residual':>15}")
+    for name, corpus in corpora(args, web_corpus):
+        graph = LinkGraph.from_corpus(corpus)
+        for solver in args.solvers:
+            log = IterationLog()
+            SOLVERS[solver](graph, pagerank.DAMPING, args.tolerance, norm=1,
+                            max_iterations=args.max_iterations, callback=log)
+            print(f"{name:<18} {solver:<15} {len(log):>10} "
+                  f"{log.total_seconds():>10.3f} {log.residuals[-1]:>15.3e}")
+
+
+def benchmark_personalized(args):
+    """
+    Compares computing personalized ranks for several topics
+    one run at a time with computing them all in one batched pass.
+    """
+    rng = random.Random(args.seed)
+    corpus = web_corpus(args.pages, args.links, args.seed)
+    pages = list(corpus)
+
+    print(f"{args.pages} pages, {args.topic_pages} pages per topic, tolerance {args.tolerance}")
+    print(f"{'topics':>6} {'separate':>10} {'batched':>10} {'speedup':>8} {'max difference':>15}")
+    for count in args.topics:
+        topics = [dict.fromkeys(rng.sample(pages, args.topic_pages), 1) for _ in range(count)]
+
+        start = time.perf_counter()
+        separate = [pagerank.personalized_pagerank(corpus, pagerank.DAMPING, [topic],
+                                                   args.tolerance)[0]
+                    for topic in topics]
+        separate_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = pagerank.personalized_pagerank(corpus, pagerank.DAMPING, topics, args.tolerance)
+        batched_seconds = time.perf_counter() - start
+
+        difference = max(abs(ranks[page] - other[page])
+                         for ranks, other in zip(separate, batched) for page in ranks)
+        print(f"{count:>6} {separate_seconds:>10.3f} {batched_seconds:>10.3f} "
+              f"{separate_seconds / batched_seconds:>7.1f}x {difference:>15.3e}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+
+    sampling = benchmarks.add_parser("sampling", help="compare random surfer samplers")
+    sampling.add_argument("corpora", nargs="*", default=["corpus0", "corpus1", "corpus2"])
+    sampling.add_argument("--synthetic", nargs="*", type=int, default=[1000, 100000])
+    sampling.add_argument("--links", type=int, default=10)
+    sampling.add_argument("--samples", type=int, default=pagerank.SAMPLES * 10)
+    sampling.add_argument("--baseline-samples", type=int, default=200)
+    sampling.add_argument("--surfers", nargs="+", type=int, default=[10, 1000, 100000])
+    sampling.add_argument("--seed", type=int, default=0)
+    sampling.set_defaults(run=benchmark_sampling)
+
+    crawling = benchmarks.add_parser("crawl", help="measure crawl throughput")
+    crawling.add_argument("--pages", type=int, default=100000)
+    crawling.add_argument("--links", type=int, default=10)
+    crawling.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    crawling.add_argument("--seed", type=int, default=0)
+    crawling.set_defaults(run=benchmark_crawl)
+
+    updating = benchmarks.add_parser("incremental", help="compare incremental rank updates")
+    updating.add_argument("--pages", type=int, default=100000)
+    updating.add_argument("--links", type=int, default=10)
+    updating.add_argument("--changes", type=int, default=100)
+    updating.add_argument("--tolerance", type=float, default=1e-6)
+    updating.add_argument("--seed", type=int, default=0)
+    updating.set_defaults(run=benchmark_incremental)
+
+    solving = benchmarks.add_parser("solvers", help="compare iterative solvers")
+    solving.add_argument("corpora", nargs="*", default=["corpus0", "corpus1", "corpus2"])
+    solving.add_argument("--synthetic", nargs="*", type=int, default=[10000, 1000000])
+    solving.add_argument("--links", type=int, default=10)
+    solving.add_argument("--solvers", nargs="+", choices=list(SOLVERS), default=list(SOLVERS))
+    solving.add_argument("--tolerance", type=float, default=1e-8)
+    solving.add_argument("--max-iterations", type=int, default=1000)
+    solving.add_argument("--seed", type=int, default=0)
+    solving.set_defaults(run=benchmark_solvers)
+
+    personalizing = benchmarks.add_parser("personalized",
+                                          help="compare separate and batched personalized ranks")
+    personalizing.add_argument("--pages", type=int, default=100000)
+    personalizing.add_argument("--links", type=int, default=10)
+    personalizing.add_argument("--topics", nargs="+", type=int, default=[1, 4, 16, 64])
+    personalizing.add_argument("--topic-pages", type=int, default=50)
+    personalizing.add_argument("--tolerance", type=float, default=1e-6)
+    personalizing.add_argument("--seed", type=int, default=0)
+    personalizing.set_defaults(run=benchmark_personalized)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import re
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy
+
+# Same pattern as `crawl`, compiled once and matched against raw bytes
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+MAGIC = b"PREDGES1"
+
+# Magic, then the number of pages and the length of the page name table in bytes
+HEADER = struct.Struct("<8s2Q")
+
+# Number of buffered page ids at which pending edges are written out
+FLUSH_EDGES = 1 << 16
+
+# Dtype of each (source, target) page id pair stored after the header
+EDGE = numpy.dtype([("source", "<i4"), ("target", "<i4")])
+
+
+def extract_links(path, chunk_size=1 << 16):
+    """
+    Returns the set of links in the HTML file at `path`,
+    reading it a chunk at a time rather than all at once.
+    """
+    links = set()
+    pending = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buffer = pending + chunk
+            end = 0
+            for match in LINK.finditer(buffer):
+                links.add(match.group(1).decode("utf-8", errors="replace"))
+                end = match.end()
+
+            if not chunk:
+                return links
+
+            # A tag may be split across chunks, so carry over anything from
+            # the last unmatched "<a" onwards, or else from a last "<" that
+            # may be the start of a tag split right after it
+            start = buffer.rfind(b"<a", end)
+            if start == -1:
+                start = buffer.rfind(b"<", end)
+            pending = buffer[start:] if start != -1 else b""
+
+
+def crawl_edges(directory, output, workers=None, executor="thread", chunksize=64):
+    """
+    Crawls the HTML pages in `directory` with a pool of `workers`
+    threads or processes, streaming the links between pages of the
+    corpus to a binary edge list at `output` as each page is parsed.
+
+    Returns the number of pages crawled.
+    """
+    pages = sorted(filename for filename in os.listdir(directory)
+                   if filename.endswith(".html"))
+    index = {page: i for i, page in enumerate(pages)}
+    names = "\n".join(pages).encode("utf-8")
+    paths = [os.path.join(directory, page) for page in pages]
+
+    Executor = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with open(output, "wb") as f, Executor(workers) as pool:
+        f.write(HEADER.pack(MAGIC, len(pages), len(names)))
+        f.write(names)
+
+        # Interleaved source, target pairs waiting to be written
+        edges = array("i")
+        for source, links in enumerate(pool.map(extract_links, paths, chunksize=chunksize)):
+            for link in links:
+                target = index.get(link)
+                if target is not None and target != source:
+                    edges.append(source)
+                    edges.append(target)
+            if len(edges) >= FLUSH_EDGES:
+                write_edges(f, edges)
+                del edges[:]
+        write_edges(f, edges)
+    return len(pages)
+
+
+def write_edges(f, edges):
+    """
+    Writes interleaved source, target pairs to `f` in the byte order of
+    EDGE, whatever the machine's own byte order.
+    """
+    numpy.asarray(edges, dtype=EDGE["source"]).tofile(f)
+
+
+def read_edges(path):
+    """
+    Reads an edge list written by `crawl_edges`, returning the
+    list of pages and arrays of link sources and targets.
+    """
+    with open(path, "rb") as f:
+        magic, count, names_length = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an edge list")
+        pages = f.read(names_length).decode("utf-8").split("\n") if count else []
+        edges = numpy.fromfile(f, dtype=EDGE)
+    return pages, edges["source"], edges["target"]
+
+
+def main():
+    if len(sys.argv) not in (3, 4):
+        sys.exit("Usage: python crawler.py corpus output [workers]")
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else None
+    count = crawl_edges(sys.argv[1], sys.argv[2], workers)
+    print(f"Crawled {count} pages into {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
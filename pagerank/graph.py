@@ -0,0 +1,130 @@
+import functools
+
+import numpy
+
+from crawler import read_edges
+
+# SciPy's sparse matrix products are much faster with many rank vectors
+# at once, but the NumPy fallback below gives the same results without it
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+class LinkGraph():
+    """
+    Link structure of a corpus, with pages interned to dense integers.
+
+    Links are kept as parallel `sources`/`targets` arrays sorted by target,
+    which is the compressed sparse row layout of the column-stochastic link
+    matrix: row `i` holds the links into page `i`, each weighted by one over
+    the number of links out of its source.
+    """
+
+    def __init__(self, pages, sources, targets):
+        self.pages = list(pages)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        n = len(self.pages)
+
+        sources = numpy.asarray(sources, dtype=numpy.int64)
+        targets = numpy.asarray(targets, dtype=numpy.int64)
+        order = numpy.argsort(targets, kind="stable")
+        self.sources = sources[order]
+        self.targets = targets[order]
+
+        self.out_degree = numpy.bincount(self.sources, minlength=n)
+        self.in_degree = numpy.bincount(self.targets, minlength=n)
+
+        # Pages without outgoing links, treated as linking to every page
+        self.dangling = self.out_degree == 0
+
+        # Weight of each link, and where each page's incoming links start
+        self.weights = 1 / self.out_degree[self.sources]
+        self.indptr = numpy.concatenate(([0], numpy.cumsum(self.in_degree)))
+
+        self.matrix = None
+        if sparse is not None:
+            self.matrix = sparse.csr_matrix((self.weights, self.sources, self.indptr), shape=(n, n))
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Builds a link graph from a corpus dictionary, as returned by
+        `crawl`, mapping each page to the set of pages it links to.
+        """
+        pages = list(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        sources = []
+        targets = []
+        for page in pages:
+            source = index[page]
+            for link in corpus[page]:
+                sources.append(source)
+                targets.append(index[link])
+        return cls(pages, sources, targets)
+
+    @classmethod
+    def from_edge_list(cls, path):
+        """Builds a link graph from an edge list written by `crawler.crawl_edges`."""
+        pages, sources, targets = read_edges(path)
+        return cls(pages, sources, targets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def out_links(self):
+        """
+        Returns (offsets, links) such that the pages linked to by page `i`
+        are `links[offsets[i]:offsets[i] + out_degree[i]]`.
+        """
+        order = numpy.argsort(self.sources, kind="stable")
+        offsets = numpy.concatenate(([0], numpy.cumsum(self.out_degree)))[:-1]
+        return offsets, self.targets[order]
+
+    def multiply(self, ranks, start=0, stop=None):
+        """
+        Returns the rank flowing along links out of non-dangling pages:
+        the link matrix times `ranks`, which may be a vector or a matrix
+        holding one rank vector per column.
+
+        Only the rows for pages `start` to `stop` are computed.
+        """
+        stop = len(self) if stop is None else stop
+        if self.matrix is not None:
+            matrix = self.matrix if start == 0 and stop == len(self) else self.matrix[start:stop]
+            return matrix @ ranks
+
+        result = numpy.zeros((stop - start,) + ranks.shape[1:])
+        first = self.indptr[start]
+        last = self.indptr[stop]
+        if first == last:
+            return result
+
+        weights = self.weights[first:last]
+        contributions = ranks[self.sources[first:last]] * (
+            weights if ranks.ndim == 1 else weights[:, None]
+        )
+
+        # reduceat sums each page's run of incoming links; pages with
+        # no incoming links would otherwise pick up a stray value
+        linked = self.in_degree[start:stop] > 0
+        result[linked] = numpy.add.reduceat(
+            contributions, self.indptr[start:stop][linked] - first, axis=0
+        )
+        return result
+
+    def row_blocks(self, bounds):
+        """
+        Returns a function for each block of rows between consecutive
+        `bounds`, which computes `multiply` for just those rows.
+        """
+        if self.matrix is not None:
+            return [self.matrix[start:stop].__matmul__
+                    for start, stop in zip(bounds[:-1], bounds[1:])]
+        return [functools.partial(self.multiply, start=start, stop=stop)
+                for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    def to_dict(self, ranks):
+        """Returns a dictionary mapping each page to its entry of `ranks`."""
+        return dict(zip(self.pages, ranks.tolist()))
@@ -0,0 +1,136 @@
+import os
+import sys
+
+import numpy
+
+from crawler import extract_links
+from graph import LinkGraph
+from pagerank import DAMPING, crawl
+from solvers import IterationLog, power_iteration
+
+# Default bound on the 1-norm of the residual left by an update
+TOLERANCE = 1e-6
+
+
+class PageRankState():
+    """
+    PageRank vector of a corpus, kept together with the link graph
+    it was computed for so that later changes can be applied to it.
+    """
+
+    def __init__(self, graph, ranks, damping_factor=DAMPING):
+        self.graph = graph
+        self.ranks = ranks
+        self.damping_factor = damping_factor
+
+    @classmethod
+    def solve(cls, graph, damping_factor=DAMPING, tolerance=TOLERANCE):
+        """Computes the ranks of `graph` from scratch."""
+        ranks = power_iteration(graph, damping_factor, tolerance, norm=1)
+        return cls(graph, ranks, damping_factor)
+
+    def save(self, path):
+        """Writes the graph and ranks to `path`."""
+        with open(path, "wb") as f:
+            numpy.savez(f, pages=numpy.array(self.graph.pages, dtype=str),
+                        sources=self.graph.sources, targets=self.graph.targets,
+                        ranks=self.ranks, damping_factor=self.damping_factor)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a state written by `save`."""
+        with numpy.load(path) as data:
+            graph = LinkGraph(data["pages"].tolist(), data["sources"], data["targets"])
+            return cls(graph, data["ranks"], float(data["damping_factor"]))
+
+    def apply(self, changed=None, removed=()):
+        """
+        Returns the link graph after a change to the corpus, and the
+        current ranks carried over to it as a starting point.
+
+        `changed` maps each added or changed page to the set of pages it
+        now links to, and `removed` lists pages no longer in the corpus.
+        As in `crawl`, only links to pages in the corpus are kept, so an
+        unchanged page that links to a newly added one must be listed
+        in `changed` for that link to count.
+        """
+        changed = changed or {}
+        removed = set(removed)
+        old = self.graph
+
+        pages = [page for page in old.pages if page not in removed]
+        pages += [page for page in changed if page not in old.index and page not in removed]
+        index = {page: i for i, page in enumerate(pages)}
+
+        # Old links survive unless their source was rewritten or either end removed
+        remap = numpy.array([index.get(page, -1) for page in old.pages], dtype=numpy.int64)
+        rewritten = numpy.zeros(len(old), dtype=bool)
+        rewritten[[old.index[page] for page in changed if page in old.index]] = True
+        keep = ~rewritten[old.sources] & (remap[old.sources] != -1) & (remap[old.targets] != -1)
+
+        sources = [remap[old.sources[keep]]]
+        targets = [remap[old.targets[keep]]]
+        for page, links in changed.items():
+            if page in removed:
+                continue
+            linked = [index[link] for link in links if link in index and link != page]
+            sources.append(numpy.full(len(linked), index[page], dtype=numpy.int64))
+            targets.append(numpy.array(linked, dtype=numpy.int64))
+        graph = LinkGraph(pages, numpy.concatenate(sources), numpy.concatenate(targets))
+
+        # Surviving pages keep their rank, new pages start from an even share
+        ranks = numpy.full(len(pages), 1 / len(pages))
+        kept = remap != -1
+        ranks[remap[kept]] = self.ranks[kept]
+        return graph, ranks / ranks.sum()
+
+    def update(self, changed=None, removed=(), tolerance=TOLERANCE):
+        """
+        Applies a change to the corpus (see `apply`) and brings the ranks
+        back within `tolerance`, by power iteration from the previous ranks.
+
+        Returns the number of iterations and the seconds they took.
+        """
+        graph, ranks = self.apply(changed, removed)
+        log = IterationLog()
+        self.ranks = power_iteration(graph, self.damping_factor, tolerance, norm=1,
+                                     initial=ranks, callback=log)
+        self.graph = graph
+        return {"iterations": len(log), "seconds": log.total_seconds()}
+
+    def to_dict(self):
+        """Returns a dictionary mapping each page to its rank."""
+        return self.graph.to_dict(self.ranks)
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.exit("Usage: python incremental.py state corpus [page ...]")
+    path, directory, pages = sys.argv[1], sys.argv[2], sys.argv[3:]
+
+    if not os.path.exists(path):
+        state = PageRankState.solve(LinkGraph.from_corpus(crawl(directory)))
+        print(f"Computed ranks of {len(state.graph)} pages")
+    else:
+        # Re-read only the named pages, dropping those that no longer exist
+        state = PageRankState.load(path)
+        changed = {}
+        removed = []
+        for page in pages:
+            filename = os.path.join(directory, page)
+            if os.path.exists(filename):
+                changed[page] = extract_links(filename)
+            else:
+                removed.append(page)
+        stats = state.update(changed, removed)
+        print(f"Updated ranks in {stats['iterations']} iterations, "
+              f"{stats['seconds']:.3f}s")
+    state.save(path)
+
+    ranks = state.to_dict()
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
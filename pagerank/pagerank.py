@@ -1,10 +1,14 @@
 import os
-import random
+import numpy
 from numpy.random import choice
 import re
 import sys
 import math
 
+from graph import LinkGraph
+from sampling import sample_ranks
+from solvers import SOLVERS, power_iteration
+
 DAMPING = 0.85
 SAMPLES = 100000
 
@@ -12,7 +16,12 @@ SAMPLES = 100000
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+
+    # A file is an edge list written by crawler.py, already crawled
+    if os.path.isfile(sys.argv[1]):
+        corpus = LinkGraph.from_edge_list(sys.argv[1])
+    else:
+        corpus = crawl(sys.argv[1])
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -50,6 +59,16 @@ def crawl(directory):
     return pages
 
 
+def link_graph(corpus):
+    """
+    Return `corpus` as a LinkGraph, accepting either a dictionary
+    returned by `crawl` or an already built LinkGraph.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph.from_corpus(corpus)
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -96,7 +115,7 @@ def transition_model(corpus, page, damping_factor):
     return res
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, surfers=1000, seed=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -104,56 +123,17 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
-    # All pages in entire corpus
-    all_pages = [key for key in corpus.keys()]
-
-    # Dictionary which will map each page to the number of generated samples that were the page
-    counts = dict()
-    for page in all_pages:
-        counts[page] = 0
-
-    # Choosing first sample randomly and updating counts dict
-    first_sample = random.choice(all_pages)
-    counts[first_sample] += 1
-
-    for i in range(1, n):
-        # If we are on the second sample, do the calculation based on the first
-        if i == 1:
-            prev_sample = first_sample
-
-        distributions = transition_model(corpus, prev_sample, damping_factor)
-
-        keys = [key for key in distributions.keys()]
-        values = [distributions[key] for key in distributions.keys()]
 
-        # Using random.choices to select an option given a list of weights (distribution)
-        current_sample = random.choices(keys, weights=values, k=1)[0]
-
-        # Updating counts dict given the current sample
-        counts[current_sample] += 1
-
-        prev_sample = current_sample
-
-    # Modifying counts dict to represent the proportion of samples that corresponded to that page instead of the raw amount
-    for page in all_pages:
-        counts[page] /= n
-
-    return counts
-
-
-def get_links(corpus, page):
+    The samples are shared between `surfers` random surfers, which
+    all take their steps together in vectorized batches. `corpus`
+    may also be a LinkGraph, such as one read from an edge list.
     """
-    Return list of all pages in corpus that link to page
-    """
-    res = []
-    for p in corpus:
-        if page in corpus[p]:
-            res.append(p)
-    return res
+    graph = link_graph(corpus)
+    return graph.to_dict(sample_ranks(graph, damping_factor, n, surfers, seed=seed))
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, tolerance=0.001, norm=numpy.inf, max_iterations=1000,
+                     solver="power", callback=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -161,41 +141,45 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
-    pagerank = dict()
-    newrank = dict()
-
-    for page in corpus:
-        pagerank[page] = 1 / len(corpus)
-
-    repeat = True
-
-    while repeat:
 
-        for page in pagerank:
+    Convergence is reached once the `norm` of the change between
+    iterations is at most `tolerance`, or after `max_iterations`.
+    `corpus` may also be a LinkGraph, such as one read from an edge list.
 
-            summation = 0
-
-            links = get_links(corpus, page)
-
-            if not links:
-                for p in corpus:
-                    summation += pagerank[p] / len(corpus)
-
-            for link in links:
-                summation += pagerank[link] / len(corpus[link])
-
-            newrank[page] = (1 - damping_factor) / len(corpus) + damping_factor * summation
-
-        repeat = False
+    `solver` names one of `solvers.SOLVERS`, and `callback`, if given, is
+    called with the iteration number, residual and seconds per iteration.
+    """
+    # Build the link matrix once, rather than rescanning the corpus every iteration
+    graph = link_graph(corpus)
+    ranks = SOLVERS[solver](graph, damping_factor, tolerance, norm, max_iterations,
+                            callback=callback)
+    return graph.to_dict(ranks)
 
-        for page in pagerank:
-            if abs(newrank[page] - pagerank[page]) > 0.001:
-                repeat = True
 
-            pagerank[page] = newrank[page]
+def personalized_pagerank(corpus, damping_factor, personalizations, tolerance=0.001,
+                          norm=numpy.inf, max_iterations=1000):
+    """
+    Return personalized PageRank values for each of `personalizations`,
+    a list of dictionaries mapping pages to how much weight the random
+    surfer's jumps should give them (pages not listed get none).
 
-    return pagerank
+    All rank vectors are computed in the same pass. Return a list holding,
+    for each personalization, a dictionary where keys are page names and
+    values are their PageRank value. Each dictionary's values sum to 1.
+    """
+    graph = link_graph(corpus)
+    teleport = numpy.zeros((len(graph), len(personalizations)))
+    for column, weights in enumerate(personalizations):
+        for page, weight in weights.items():
+            teleport[graph.index[page], column] = weight
+        total = teleport[:, column].sum()
+        if total <= 0:
+            raise ValueError("personalization must give some page positive weight")
+        teleport[:, column] /= total
+
+    ranks = power_iteration(graph, damping_factor, tolerance, norm, max_iterations,
+                            teleport=teleport)
+    return [graph.to_dict(ranks[:, column]) for column in range(len(personalizations))]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+import numpy
+
+
+class SurferModel():
+    """
+    Transition tables for the random surfer, built once per graph:
+    the links out of page `i` are `links[offsets[i]:offsets[i] + out_degree[i]]`.
+    """
+
+    def __init__(self, graph):
+        self.offsets, self.links = graph.out_links()
+        self.out_degree = graph.out_degree
+        self.dangling = graph.dangling
+        self.n = len(graph)
+
+    def step(self, pages, damping_factor, rng):
+        """
+        Returns the next page of every surfer currently on `pages`.
+
+        Each surfer flips a coin: with probability `damping_factor` it
+        follows one of its page's links chosen at random, otherwise (or
+        if its page has no links) it jumps to any page at random.
+        """
+        follow = (rng.random(len(pages)) < damping_factor) & ~self.dangling[pages]
+        next_pages = rng.integers(0, self.n, len(pages))
+        current = pages[follow]
+        choices = (rng.random(len(current)) * self.out_degree[current]).astype(numpy.int64)
+        next_pages[follow] = self.links[self.offsets[current] + choices]
+        return next_pages
+
+
+def sample_ranks(graph, damping_factor, n, surfers=1000, burn_in=50, seed=None):
+    """
+    Returns PageRank estimates for every page of `graph` from `n` samples,
+    shared between `surfers` independent random surfers walking in lockstep.
+
+    Each surfer starts on a page chosen at random and takes `burn_in`
+    uncounted steps first, so that short walks do not favour their start.
+    """
+    model = SurferModel(graph)
+    rng = numpy.random.default_rng(seed)
+    surfers = max(1, min(surfers, n))
+
+    pages = rng.integers(0, model.n, surfers)
+    for _ in range(burn_in):
+        pages = model.step(pages, damping_factor, rng)
+
+    counts = numpy.zeros(model.n, dtype=numpy.int64)
+    remaining = n
+    while remaining > 0:
+        counted = pages[:remaining]
+        counts += numpy.bincount(counted, minlength=model.n)
+        remaining -= len(counted)
+        if remaining > 0:
+            pages = model.step(pages, damping_factor, rng)
+
+    return counts / n
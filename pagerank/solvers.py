@@ -0,0 +1,194 @@
+import time
+
+import numpy
+
+
+# Gauss-Seidel sweeps use at least this many blocks, and more on large
+# graphs, so that no block has many more than BLOCK_PAGES pages
+MIN_BLOCKS = 64
+BLOCK_PAGES = 2048
+
+
+def step(graph, ranks, damping_factor, teleport=None):
+    """
+    Returns the ranks after one step of the random surfer.
+
+    With probability `damping_factor` the surfer follows a link, or from a
+    dangling page jumps anywhere; otherwise it jumps to a page at random.
+
+    `ranks` may hold one rank vector per column. By default jumps land on
+    every page evenly, but `teleport` may give the distribution they land
+    with instead, either one for all columns or one per column.
+    """
+    n = len(graph)
+    if teleport is None:
+        teleport = 1 / n
+    dangling = ranks[graph.dangling].sum(axis=0)
+
+    # Random jumps and jumps away from dangling pages land the same way
+    return (damping_factor * graph.multiply(ranks)
+            + ((1 - damping_factor) + damping_factor * dangling) * teleport)
+
+
+def residual_norm(change, norm):
+    """
+    Returns the `norm` of the change between iterations, taking the
+    largest over columns if there is more than one rank vector.
+    """
+    return numpy.linalg.norm(change, ord=norm, axis=0).max()
+
+
+class IterationLog():
+    """
+    Callback for any solver that records the residual
+    and time taken by every iteration.
+    """
+
+    def __init__(self):
+        self.residuals = []
+        self.seconds = []
+
+    def __call__(self, iteration, residual, seconds):
+        self.residuals.append(residual)
+        self.seconds.append(seconds)
+
+    def __len__(self):
+        return len(self.residuals)
+
+    def total_seconds(self):
+        """Returns the time taken by all iterations together."""
+        return sum(self.seconds)
+
+
+def power_iteration(graph, damping_factor, tolerance=0.001, norm=numpy.inf, max_iterations=1000,
+                    initial=None, callback=None, teleport=None):
+    """
+    Returns the PageRank vector of `graph` by repeatedly applying
+    `step`, starting from `initial` or else the uniform distribution.
+
+    Stops once the `norm` of the change between iterations is at most
+    `tolerance`, or after `max_iterations` iterations. If given, `callback`
+    is called after every iteration with the iteration number, the
+    residual and the seconds the iteration took.
+
+    If `teleport` is an n-by-K matrix of jump distributions, K personalized
+    rank vectors are computed together, as the columns of an n-by-K result,
+    so that each iteration is a single sparse-times-dense product.
+    """
+    n = len(graph)
+    if initial is None:
+        initial = numpy.full(n, 1 / n) if teleport is None else teleport
+    ranks = initial
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        new_ranks = step(graph, ranks, damping_factor, teleport)
+        residual = residual_norm(new_ranks - ranks, norm)
+        ranks = new_ranks
+        if callback is not None:
+            callback(iteration, residual, time.perf_counter() - start)
+        if residual <= tolerance:
+            break
+    return ranks
+
+
+def gauss_seidel(graph, damping_factor, tolerance=0.001, norm=numpy.inf, max_iterations=1000,
+                 initial=None, callback=None, blocks=None):
+    """
+    Returns the PageRank vector of `graph` by block Gauss-Seidel iteration.
+
+    Each sweep updates the pages in `blocks` consecutive blocks (by
+    default MIN_BLOCKS, or one per BLOCK_PAGES pages if that is more),
+    and every block already sees the new ranks of the blocks before it,
+    which can converge in fewer sweeps than power iteration. With one page
+    per block this is plain Gauss-Seidel. Other arguments are as for
+    `power_iteration`.
+    """
+    n = len(graph)
+    ranks = numpy.full(n, 1 / n) if initial is None else initial.copy()
+    if blocks is None:
+        blocks = max(MIN_BLOCKS, n // BLOCK_PAGES)
+    bounds = numpy.linspace(0, n, min(blocks, n) + 1).astype(numpy.int64)
+
+    # Slicing the link matrix is costly, so each block's rows are taken once,
+    # along with which of its pages are dangling
+    multiplies = graph.row_blocks(bounds)
+    dangling_pages = [numpy.flatnonzero(graph.dangling[first:last]) + first
+                      for first, last in zip(bounds[:-1], bounds[1:])]
+
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        previous = ranks.copy()
+        dangling = ranks[graph.dangling].sum()
+        for first, last, multiply, pages in zip(bounds[:-1], bounds[1:], multiplies, dangling_pages):
+            block = ((1 - damping_factor) / n
+                     + damping_factor * (multiply(ranks) + dangling / n))
+
+            # Keep the dangling rank in step with the pages just updated
+            if len(pages):
+                dangling += block[pages - first].sum() - ranks[pages].sum()
+            ranks[first:last] = block
+
+        # Unlike a surfer step, a sweep does not keep the total rank at one,
+        # and rescaling removes what would otherwise be the slowest error
+        ranks /= ranks.sum()
+        residual = numpy.linalg.norm(ranks - previous, ord=norm)
+        if callback is not None:
+            callback(iteration, residual, time.perf_counter() - start)
+        if residual <= tolerance:
+            break
+    return ranks
+
+
+def extrapolated_power_iteration(graph, damping_factor, tolerance=0.001, norm=numpy.inf,
+                                 max_iterations=1000, initial=None, callback=None, period=10):
+    """
+    Returns the PageRank vector of `graph` by power iteration with
+    quadratic extrapolation (Kamvar et al., 2003).
+
+    Every `period` iterations, the last four iterates are used to estimate
+    and cancel the two slowest-decaying error components, jumping closer to
+    the fixed point than plain iteration would. Arguments are otherwise as
+    for `power_iteration`.
+    """
+    n = len(graph)
+    ranks = numpy.full(n, 1 / n) if initial is None else initial
+    history = [ranks]
+    for iteration in range(1, max_iterations + 1):
+        start = time.perf_counter()
+        new_ranks = step(graph, ranks, damping_factor)
+        residual = numpy.linalg.norm(new_ranks - ranks, ord=norm)
+        ranks = new_ranks
+        history = history[-3:] + [ranks]
+        if residual > tolerance and iteration % period == 0 and len(history) == 4:
+            ranks = quadratic_extrapolation(*history)
+            history = [ranks]
+        if callback is not None:
+            callback(iteration, residual, time.perf_counter() - start)
+        if residual <= tolerance:
+            break
+    return ranks
+
+
+def quadratic_extrapolation(x0, x1, x2, x3):
+    """
+    Returns the quadratic extrapolation of four successive iterates,
+    renormalized to a probability distribution.
+    """
+    y1 = x1 - x0
+    y2 = x2 - x0
+    y3 = x3 - x0
+    (gamma1, gamma2), *_ = numpy.linalg.lstsq(numpy.column_stack((y1, y2)), -y3, rcond=None)
+    gamma3 = 1
+    ranks = (gamma1 + gamma2 + gamma3) * x1 + (gamma2 + gamma3) * x2 + gamma3 * x3
+
+    # A poor fit can push tiny ranks below zero, which no distribution allows
+    ranks = numpy.clip(ranks, 0, None)
+    return ranks / ranks.sum()
+
+
+# Solvers selectable by name
+SOLVERS = {
+    "power": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "extrapolation": extrapolated_power_iteration,
+}
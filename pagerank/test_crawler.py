@@ -0,0 +1,21 @@
+import os
+
+from crawler import extract_links
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_chunked_extraction_matches_whole_file():
+    for corpus in ("corpus0", "corpus1", "corpus2"):
+        directory = os.path.join(DIRECTORY, corpus)
+        for page in os.listdir(directory):
+            path = os.path.join(directory, page)
+            expected = extract_links(path, chunk_size=os.path.getsize(path) + 1)
+            for chunk_size in range(1, 64):
+                assert extract_links(path, chunk_size) == expected, (path, chunk_size)
+
+
+def test_tag_split_right_after_bracket(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_bytes(b"x" * 65535 + b'<a href="2.html">')
+    assert extract_links(str(path)) == {"2.html"}